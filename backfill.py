@@ -0,0 +1,238 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, List
+from web3 import Web3
+from network import conn
+from metrics import metrics
+import decoder
+import limiter
+import config
+
+DEBUG = True
+
+# above this many deposit addresses logs are filtered locally, not by topic
+TOPIC_FILTER_LIMIT = 1_000
+
+
+class Backfill:
+    """
+    Scans past blocks for deposits the head loop did not see: Transfer logs
+    of the whitelisted tokens to our addresses, and native ETH transfers from
+    the block bodies. `workers` threads take chunks of the range from a
+    shared cursor. A chunk the node rejects, e.g. too many logs, is split in
+    half and the chunk size shrinks; it doubles back on success, up to
+    `max_chunk`. The first block not yet scanned is checkpointed so an
+    interrupted backfill resumes where it stopped. Deposits found are
+    recorded in the sweeper's ledger.
+    """
+
+    def __init__(
+        self,
+        sweeper,
+        workers=config.BACKFILL_WORKERS,
+        max_chunk=config.BACKFILL_CHUNK,
+        checkpoint=config.BACKFILL_CHECKPOINT,
+        native=True,
+        provider=conn,
+    ):
+        self.sweeper = sweeper
+        self.workers = workers
+        self.max_chunk = max_chunk
+        self.chunk = max_chunk
+        self.checkpoint = checkpoint
+        self.native = native
+        self.provider = provider
+        self._lock = Lock()
+
+    def accounts(self):
+        return self.sweeper.keystore or decoder.address_set(self.sweeper.acc_list)
+
+    def transfer_logs(self, lo: int, hi: int, accounts) -> List[decoder.Deposit]:
+        tokens = [
+            Web3.to_checksum_address(t.token_address)
+            for t in self.sweeper.whitelist_token
+        ]
+        if not tokens:
+            return []
+        topics = [decoder.TRANSFER_TOPIC]
+        if isinstance(accounts, set) and len(accounts) <= TOPIC_FILTER_LIMIT:
+            topics += [None, ["0x" + a[2:].rjust(64, "0") for a in accounts]]
+        logs = self.provider.eth.get_logs(
+            {"fromBlock": lo, "toBlock": hi, "address": tokens, "topics": topics}
+        )
+        deposits = []
+        for log in logs:
+            deposit = decoder.decode_transfer_log(log)
+            if deposit is not None and deposit.recipient.lower() in accounts:
+                deposits.append(deposit)
+        return deposits
+
+    def native_deposits(self, lo: int, hi: int, accounts) -> List[decoder.Deposit]:
+        deposits = []
+        for n in range(lo, hi + 1):
+            block = self.provider.eth.get_block(n, full_transactions=True)
+            for tx in block["transactions"]:
+                deposit = decoder.decode_native(tx, accounts)
+                if deposit is not None:
+                    deposit.block_number = n
+                    deposits.append(deposit)
+        return deposits
+
+    def scan(self, lo: int, hi: int) -> List[decoder.Deposit]:
+        """
+        :return: deposits to our addresses in blocks lo..hi, both included
+        """
+        accounts = self.accounts()
+        with limiter.priority(limiter.BULK):
+            deposits = self.transfer_logs(lo, hi, accounts)
+            if self.native:
+                deposits += self.native_deposits(lo, hi, accounts)
+        return deposits
+
+    def load_checkpoint(self, start: int) -> int:
+        """
+        :return: first block to be scanned, after the checkpoint of a run from
+            the same start, whatever its end: a restart extends it to the new head
+        """
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return start
+        with open(self.checkpoint) as f:
+            saved = json.load(f)
+        if saved["start"] != start:
+            return start
+        return saved["next"]
+
+    def save_checkpoint(self, start: int, end: int, next_block: int):
+        if self.checkpoint is None:
+            return
+        tmp = self.checkpoint + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"start": start, "end": end, "next": next_block}, f)
+        os.replace(tmp, self.checkpoint)
+
+    def run(
+        self,
+        start: int,
+        end: int = None,
+        on_deposits: Callable[[str], None] = None,
+        debug=DEBUG,
+    ) -> dict:
+        """
+        :param start: first block to be scanned
+        :param end: last block to be scanned, the current head by default
+        :param on_deposits: called once per credited account as soon as its
+            chunk is scanned, e.g. SweepQueue.put
+        :return: {account: number of deposits found}
+        """
+        end = self.provider.eth.block_number if end is None else end
+        cursor = self.load_checkpoint(start)
+        # ranges to be scanned again after a split, taken before the cursor
+        retry = []
+        # lo -> hi of scanned chunks not yet contiguous with the frontier
+        done = {}
+        frontier = cursor
+        found = {}
+        scanned = 0
+        started = time.monotonic()
+
+        def take():
+            nonlocal cursor
+            with self._lock:
+                if retry:
+                    return retry.pop()
+                if cursor > end:
+                    return None
+                lo, hi = cursor, min(cursor + self.chunk - 1, end)
+                cursor = hi + 1
+                return lo, hi
+
+        def finish(lo: int, hi: int, deposits: List[decoder.Deposit]):
+            nonlocal frontier, scanned
+            with self._lock:
+                self.chunk = min(self.max_chunk, self.chunk * 2)
+                done[lo] = hi
+                while frontier in done:
+                    frontier = done.pop(frontier) + 1
+                scanned += hi - lo + 1
+                rate = scanned / max(time.monotonic() - started, 1e-9)
+                metrics.set("backfill.blocks_per_second", rate)
+                metrics.set("backfill.next_block", frontier)
+                credited = []
+                for d in deposits:
+                    if d.recipient not in found:
+                        credited.append(d.recipient)
+                    found[d.recipient] = found.get(d.recipient, 0) + 1
+                self.save_checkpoint(start, end, frontier)
+            if self.sweeper.ledger is not None:
+                # logs only exist for transfers that did not revert
+                self.sweeper.ledger.record_deposits(deposits)
+                self.sweeper.ledger.flush()
+            if debug:
+                print(
+                    f"[Backfill] {lo}-{hi}: {len(deposits)} deposits, next: {frontier}, {rate:.1f} blocks/s"
+                )
+            if on_deposits is not None:
+                for account in credited:
+                    on_deposits(account)
+
+        def work():
+            while True:
+                chunk = take()
+                if chunk is None:
+                    return
+                lo, hi = chunk
+                try:
+                    deposits = self.scan(lo, hi)
+                except Exception as e:
+                    if lo == hi:
+                        raise
+                    # most likely a range or result limit of the node
+                    mid = (lo + hi) // 2
+                    with self._lock:
+                        self.chunk = max(1, (hi - lo + 1) // 2)
+                        retry.extend([(mid + 1, hi), (lo, mid)])
+                    metrics.inc("backfill.splits")
+                    if debug:
+                        print(f"[Backfill] {lo}-{hi} rejected, split: {e}")
+                    continue
+                finish(lo, hi, deposits)
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            for f in [pool.submit(work) for _ in range(self.workers)]:
+                f.result()
+
+        if debug:
+            elapsed = time.monotonic() - started
+            print(
+                f"[Backfill] {start}-{end} done, {len(found)} acc credited, {scanned / max(elapsed, 1e-9):.1f} blocks/s"
+            )
+        return found
+
+
+if __name__ == "__main__":
+    from classes import Sweeper
+    from keystore import Keystore
+    from sweep_queue import SweepQueue
+
+    if len(sys.argv) < 3:
+        print("usage: python3 backfill.py <keystore> <from block> [<to block>]")
+        sys.exit(1)
+    sweeper = Sweeper()
+    sweeper.keystore = Keystore(sys.argv[1], os.environ.get("KEYSTORE_PASSWORD"))
+    if config.TOKEN_FILE:
+        sweeper.whitelist_token.load()
+    queue = SweepQueue(sweeper.handle_new_tx)
+    queue.start()
+    Backfill(sweeper).run(
+        int(sys.argv[2]),
+        int(sys.argv[3]) if len(sys.argv) > 3 else None,
+        on_deposits=queue.put,
+    )
+    # let the queued sweeps finish
+    while metrics.get("sweep_queue.length") or metrics.get("sweep_queue.utilization"):
+        time.sleep(1)
+    queue.stop()
@@ -0,0 +1,182 @@
+import os
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+from web3 import Web3
+from network import conn
+from account import Account
+from keystore import Keystore
+from ledger import DepositLedger
+from classes import User
+import decoder
+import calldata
+import snapshot
+import constants
+import utils
+
+
+def timeit(fn, n) -> float:
+    """
+    :param fn: function to be benchmarked, called with the iteration index
+    :param n: number of iterations
+    :return: iterations per second
+    """
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - start)
+
+
+def bench_tx_builder(n=10_000):
+    signer = Account(constants.SIGNER, constants.SIGNER_PKEY)
+    dest = utils.create_new_account(conn)
+    token_address = Web3.to_checksum_address("0x" + "11" * 20)
+    contract = utils.get_contract_instance(conn, token_address)["instance"]
+    builder = calldata.TxBuilder()
+    builder._chain_id = 1
+    fields = {"gas": 60_000, "gasPrice": 30_000_000_000, "chainId": 1}
+
+    def web3_path(i):
+        return contract.functions.transfer(dest.address, i).build_transaction(
+            {"from": signer.address, "nonce": i, **fields}
+        )
+
+    def builder_path(i):
+        return builder.transfer(
+            token_address,
+            signer.address,
+            dest.address,
+            i,
+            nonce=i,
+            gas=60_000,
+            gasPrice=30_000_000_000,
+        )
+
+    for i in (0, 1, 10**18):
+        expected = conn.eth.account.sign_transaction(web3_path(i), signer.private_key)
+        actual = conn.eth.account.sign_transaction(builder_path(i), signer.private_key)
+        assert expected.rawTransaction == actual.rawTransaction, "signed bytes differ"
+
+    print(f"[Bench] web3 build_transaction: {timeit(web3_path, n):,.0f} tx/s")
+    print(f"[Bench] calldata.TxBuilder:     {timeit(builder_path, n):,.0f} tx/s")
+
+
+def bench_keystore(n=1_000_000, path="bench_keystore.bin"):
+    random.seed(0)
+    records = [(random.randbytes(20), random.randbytes(32)) for _ in range(n)]
+    tracemalloc.start()
+    accounts = [Account("0x" + a.hex(), "0x" + k.hex()) for a, k in records]
+    objects_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    Keystore.write(path, accounts)
+    tracemalloc.start()
+    ks = Keystore(path)
+    keystore_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    probes = [random.choice(accounts).address for _ in range(100_000)]
+    misses = ["0x" + random.randbytes(20).hex() for _ in range(100_000)]
+    print(f"[Bench] {n:,} Account objects: {objects_mem / n:,.0f} B/acc")
+    print(
+        f"[Bench] keystore file: {os.path.getsize(path) / n:,.0f} B/acc, heap: {keystore_mem:,} B"
+    )
+    print(
+        f"[Bench] keystore hit lookups:  {timeit(lambda i: ks.find(probes[i]), len(probes)):,.0f} /s"
+    )
+    print(
+        f"[Bench] keystore miss lookups: {timeit(lambda i: ks.find(misses[i]), len(misses)):,.0f} /s"
+    )
+    print(
+        f"[Bench] keystore get Account:  {timeit(lambda i: ks.get(probes[i]), len(probes)):,.0f} /s"
+    )
+    ks.close()
+    os.remove(path)
+
+
+def bench_snapshot(n=100_000, tokens=3):
+    random.seed(0)
+    wei = np.array(
+        [[random.randrange(10**24) for _ in range(tokens + 1)] for _ in range(n)],
+        dtype=object,
+    )
+    limbs = np.array(
+        [[snapshot.to_limbs(int(w)) for w in row] for row in wei], dtype=np.uint32
+    )
+    snap = snapshot.BalanceSnapshot(
+        addresses=np.array(["0x" + random.randbytes(20).hex() for _ in range(n)]),
+        user_ids=np.random.default_rng(0).integers(-1, 1_000, n),
+        users=[f"user{i}" for i in range(1_000)],
+        symbols=["ETH"] + [f"T{i}" for i in range(tokens)],
+        decimals=np.array([18] * (tokens + 1)),
+        limbs=limbs,
+    )
+    prices = {s: 1.0 + i for i, s in enumerate(snap.symbols)}
+
+    totals = snap.totals_per_token()
+    assert totals["ETH"] == int(wei[:, 0].sum()), "totals are not exact"
+
+    reports = {
+        "totals per token": lambda i: snap.totals_per_token(),
+        "totals per user": lambda i: snap.totals_per_user(),
+        "top 100": lambda i: snap.top_n(100, prices),
+        "above threshold": lambda i: snap.above_threshold(50, prices),
+    }
+    for name, fn in reports.items():
+        print(f"[Bench] snapshot {name} over {n:,} acc: {1000 / timeit(fn, 10):.1f} ms")
+
+
+def bench_ledger(n=2_000_000, users=10_000, path="bench_ledger.bin"):
+    random.seed(0)
+    accounts = ["0x" + random.randbytes(20).hex() for _ in range(users * 2)]
+    tokens = ["0x" + random.randbytes(20).hex() for _ in range(3)] + [decoder.NATIVE]
+    ledger = DepositLedger(path)
+    for u in range(users):
+        user = User(f"user{u}")
+        user.wallets = [Account(a, "") for a in accounts[2 * u : 2 * u + 2]]
+        ledger.add_user(user)
+    deposits = [
+        decoder.Deposit(
+            token=random.choice(tokens),
+            sender=accounts[0],
+            recipient=random.choice(accounts),
+            amount=random.randrange(10**24),
+            block_number=i,
+        )
+        for i in range(n)
+    ]
+
+    print(
+        f"[Bench] ledger ingest: {timeit(lambda i: ledger.record_deposit(deposits[i]), n):,.0f} records/s"
+    )
+    ledger.close()
+    expected = ledger.user_balances("user0")
+    print(f"[Bench] ledger file: {os.path.getsize(path) / ledger.records:.0f} B/record")
+
+    start = time.perf_counter()
+    rebuilt = DepositLedger(path)
+    print(
+        f"[Bench] ledger rebuild of {rebuilt.records:,} records: {time.perf_counter() - start:.2f} s"
+    )
+    assert rebuilt.user_balances("user0") == expected, "rebuilt totals differ"
+    print(
+        f"[Bench] ledger balance lookups: {timeit(lambda i: rebuilt.balance(f'user{i % users}', tokens[i % 4]), 1_000_000):,.0f} /s"
+    )
+    rebuilt.close()
+    os.remove(path)
+
+
+BENCHMARKS = {
+    "tx_builder": bench_tx_builder,
+    "keystore": bench_keystore,
+    "snapshot": bench_snapshot,
+    "ledger": bench_ledger,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,165 @@
+import time
+from web3 import Web3
+from network import conn
+import ERC20
+
+# functions the sweeper actually sends, everything else goes through web3
+SWEEP_FUNCTIONS = ("transfer", "transferFrom", "approve")
+
+
+def function_signature(abi_entry: dict) -> str:
+    """
+    :param abi_entry: function entry of a contract abi
+    :return: canonical signature, e.g. transfer(address,uint256)
+    """
+    arg_types = ",".join(i["type"] for i in abi_entry["inputs"])
+    return f"{abi_entry['name']}({arg_types})"
+
+
+def load_selectors(abi, names=SWEEP_FUNCTIONS) -> dict:
+    """
+    :param abi: contract abi
+    :param names: function names to be precomputed
+    :return: {function name: 4-byte selector}
+    """
+    selectors = {}
+    for entry in abi:
+        if entry.get("type") == "function" and entry.get("name") in names:
+            selectors[entry["name"]] = Web3.keccak(text=function_signature(entry))[:4]
+    return selectors
+
+
+SELECTORS = load_selectors(ERC20.abi)
+TRANSFER = SELECTORS["transfer"]
+TRANSFER_FROM = SELECTORS["transferFrom"]
+APPROVE = SELECTORS["approve"]
+
+
+def pack_address(address: str) -> bytes:
+    return bytes(12) + bytes.fromhex(address[2:])
+
+
+def pack_uint(value: int) -> bytes:
+    return value.to_bytes(32, "big")
+
+
+def encode_transfer(to: str, amount: int) -> bytes:
+    return TRANSFER + pack_address(to) + pack_uint(amount)
+
+
+def encode_transfer_from(_from: str, to: str, amount: int) -> bytes:
+    return TRANSFER_FROM + pack_address(_from) + pack_address(to) + pack_uint(amount)
+
+
+def encode_approve(spender: str, amount: int) -> bytes:
+    return APPROVE + pack_address(spender) + pack_uint(amount)
+
+
+class TxBuilder:
+    """
+    Builds the sweeper's transactions without going through
+    `contract.functions.X(...).build_transaction`. Produces the same fields
+    web3 fills in, so the signed bytes are identical. The chain id is read
+    once and the fee fields once per head.
+    """
+
+    def __init__(self, provider=conn, fee_max_age=12.0):
+        self.provider = provider
+        self._chain_id = None
+        # seconds the fee fields are kept when no head invalidates them, one slot
+        self.fee_max_age = fee_max_age
+        self._fees = None
+        self._fees_at = 0.0
+
+    @property
+    def chain_id(self) -> int:
+        if self._chain_id is None:
+            self._chain_id = self.provider.eth.chain_id
+        return self._chain_id
+
+    def dynamic_fees(self) -> dict:
+        """
+        :return: EIP-1559 fee fields, same defaults as web3's build_transaction
+        """
+        fees = self._fees
+        if fees is None or time.monotonic() - self._fees_at > self.fee_max_age:
+            priority_fee = self.provider.eth.max_priority_fee
+            base_fee = self.provider.eth.get_block("latest")["baseFeePerGas"]
+            fees = {
+                "maxFeePerGas": priority_fee + 2 * base_fee,
+                "maxPriorityFeePerGas": priority_fee,
+            }
+            self._fees, self._fees_at = fees, time.monotonic()
+        return dict(fees)
+
+    def on_block(self, block_number: int):
+        """
+        a new head changes the base fee, the next dynamic_fees reads it again
+        """
+        self._fees = None
+
+    def build(
+        self, sender: str, to: str, nonce: int, gas: int, data=b"", value=0, **fees
+    ) -> dict:
+        """
+        :param sender: address of the sender
+        :param to: destination, the token contract for calls
+        :param nonce: nonce of the sender
+        :param gas: gas limit, estimated by the node when None
+        :param data: encoded calldata
+        :param value: wei to be sent
+        :param fees: gasPrice or maxFeePerGas/maxPriorityFeePerGas
+        :return: transaction dict ready to be signed
+        """
+        tx = {
+            "from": sender,
+            "to": to,
+            "value": value,
+            "nonce": nonce,
+            "chainId": self.chain_id,
+            **fees,
+        }
+        if data:
+            tx["data"] = "0x" + data.hex()
+        tx["gas"] = gas if gas is not None else self.provider.eth.estimate_gas(tx)
+        return tx
+
+    def transfer(
+        self, token: str, sender: str, to: str, amount: int, nonce, gas=None, **fees
+    ):
+        return self.build(
+            sender, token, nonce, gas, encode_transfer(to, amount), **fees
+        )
+
+    def transfer_from(
+        self,
+        token: str,
+        sender: str,
+        _from: str,
+        to: str,
+        amount: int,
+        nonce,
+        gas=None,
+        **fees,
+    ):
+        data = encode_transfer_from(_from, to, amount)
+        return self.build(sender, token, nonce, gas, data, **fees)
+
+    def approve(
+        self,
+        token: str,
+        sender: str,
+        spender: str,
+        amount: int,
+        nonce,
+        gas=None,
+        **fees,
+    ):
+        data = encode_approve(spender, amount)
+        return self.build(sender, token, nonce, gas, data, **fees)
+
+    def send_eth(self, sender: str, to: str, value: int, nonce, gas=None, **fees):
+        return self.build(sender, to, nonce, gas, value=value, **fees)
+
+
+builder = TxBuilder()
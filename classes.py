@@ -1,14 +1,26 @@
 from pydantic import BaseModel
 from web3 import Web3
-from typing import List, Any
+from web3.exceptions import TransactionNotFound
+from typing import Iterator, List, Any
 from prettytable import PrettyTable
 from network import conn
 from account import Account
 import constants
 import utils
 import config
+from calldata import builder
+from nonces import nonces, sign_and_send
+from pending import pending_txs
+from metrics import metrics
+from prices import price_cache
+from costs import cost_model, DeferredSweeps
+from allowances import allowances
+from tracing import tracer
+from registry import TokenRegistry
+from planner import SweepPlanner
+from collections import deque
+import decoder
 import statistics
-import time
 
 DEBUG = True
 
@@ -64,6 +76,24 @@ class Token(BaseModel):
                     f"[Token] New token {symbol}({token_address[:6]}...) created by admin"
                 )
 
+    @classmethod
+    def at(cls, token_address: str, symbol: str, decimals=18, name=None):
+        """
+        :param token_address: address of an already deployed token
+        :param symbol: token symbol
+        :param decimals: token decimals
+        :param name: token name
+        :return: Token attached to the contract, nothing is deployed
+        """
+        return cls.model_construct(
+            token_address=token_address,
+            contract=utils.get_contract_instance(conn, token_address)["instance"],
+            owner=constants.SIGNER,
+            name=name,
+            symbol=symbol,
+            decimals=decimals,
+        )
+
     def __repr__(self) -> str:
         return f"address: {self.token_address}\nname: {self.name}\nsymbol: {self.symbol}\nsupply: {self.supply}\ndecimals: {self.decimals}\nowner: {self.owner}"
 
@@ -87,15 +117,21 @@ class Token(BaseModel):
         amount: int,
         debug=DEBUG,
     ):
-        tx = self.contract.functions.approve(spender, amount).build_transaction(
-            {
-                "from": signer.address,
-                "nonce": conn.eth.get_transaction_count(signer.address),
-                "gasPrice": conn.to_wei("30", "gwei"),
-            }
+        tx = builder.approve(
+            self.token_address,
+            signer.address,
+            spender,
+            amount,
+            nonce=nonces.next(signer.address),
+            gasPrice=conn.to_wei("30", "gwei"),
         )
-        signed_tx = conn.eth.account.sign_transaction(tx, signer.private_key)
-        tx_hash = conn.eth.send_raw_transaction(signed_tx.rawTransaction)
+        try:
+            tx_hash = sign_and_send(tx, signer.private_key)
+        except Exception:
+            allowances.invalidate(self.token_address, signer.address, spender)
+            raise
+        allowances.approved(self.token_address, signer.address, spender, amount)
+        allowances.watch(tx_hash, tx, self.token_address, signer.address, spender)
 
         if debug:
             print(
@@ -108,8 +144,17 @@ class Token(BaseModel):
     def approve_if_necessary(
         self, _from: Account, _to: Account, amount: int, debug=DEBUG
     ):
+        curr_allowance = allowances.get(
+            self.token_address,
+            _from.address,
+            _to.address,
+            lambda: self.allowance(_from, _to.address),
+        )
+        to_be_approved = amount - curr_allowance
+        if to_be_approved <= 0:
+            return
+
         eth = Eth()
-        curr_allowance = self.allowance(_from, _to.address)
         eth_balance = eth.check_balance(_from)
         if eth_balance < config.GAS_AMOUNT:
             to_be_sent = config.GAS_AMOUNT - eth_balance
@@ -119,13 +164,11 @@ class Token(BaseModel):
                 to_be_sent,
             )
 
-        to_be_approved = amount - curr_allowance
-        if to_be_approved > 0:
-            if debug:
-                print(
-                    f"[Token] Insuff. allowance, Amount need to be approved: {to_be_approved}"
-                )
-            self.approve(_from, constants.SIGNER, to_be_approved)
+        if debug:
+            print(
+                f"[Token] Insuff. allowance, Amount need to be approved: {to_be_approved}"
+            )
+        self.approve(_from, _to.address, allowances.to_approve(to_be_approved))
 
     def transfer(self, _from: Account, _to: Account, amount: int, debug=DEBUG):
         eth = Eth()
@@ -137,54 +180,47 @@ class Token(BaseModel):
                 _from.address,
                 to_be_sent,
             )
-        tx = self.contract.functions.transfer(_to.address, amount).build_transaction(
-            {
-                "from": _from.address,
-                "nonce": conn.eth.get_transaction_count(_from.address),
-                "gas": 20_000_000,
-            }
+        tx = builder.transfer(
+            self.token_address,
+            _from.address,
+            _to.address,
+            amount,
+            nonce=nonces.next(_from.address),
+            **builder.dynamic_fees(),
         )
-        gas = conn.eth.estimate_gas(tx)
-        tx.update({"gas": gas})
-        signed_tx = conn.eth.account.sign_transaction(tx, _from.private_key)
-        tx_hash = conn.eth.send_raw_transaction(signed_tx.rawTransaction)
+        tx_hash = sign_and_send(tx, _from.private_key)
         if debug:
             print(
                 f"[Token] {_from.shorten_address} transferred {amount/10**self.decimals} {self.symbol} to {_to.shorten_address} (txHash: {tx_hash.hex()[:4] + '...' + tx_hash.hex()[-4:]})"
             )
+        return tx_hash
 
     def transfer_from(self, _from: Account, _to: Account, amount: int, debug=DEBUG):
         self.approve_if_necessary(_from, _to, amount)
 
-        tx = self.contract.functions.transferFrom(
-            _from.address, _to.address, amount
-        ).build_transaction(
-            {
-                "from": _from.address,
-                "nonce": conn.eth.get_transaction_count(_from.address),
-                "gas": 0,
-            }
+        # the spender pulls the tokens
+        tx = builder.transfer_from(
+            self.token_address,
+            _to.address,
+            _from.address,
+            _to.address,
+            amount,
+            nonce=nonces.next(_to.address),
+            **builder.dynamic_fees(),
         )
-        gas = conn.eth.estimate_gas(tx)
-        tx.update({"gas": gas})
-        signed_tx = conn.eth.account.sign_transaction(tx, _from.private_key)
-        tx_hash = conn.eth.send_raw_transaction(signed_tx.rawTransaction)
+        try:
+            tx_hash = sign_and_send(tx, _to.private_key)
+        except Exception:
+            allowances.invalidate(self.token_address, _from.address, _to.address)
+            raise
+        allowances.spent(self.token_address, _from.address, _to.address, amount)
+        allowances.watch(tx_hash, tx, self.token_address, _from.address, _to.address)
 
         if debug:
             print(
                 f"[Token] {amount/10**self.decimals} {self.symbol} was transferred from {_from.shorten_address} to {_to.shorten_address} (txHash: {tx_hash.hex()[:4] + '...' + tx_hash.hex()[-4:]})"
             )
 
-    def withdraw_all(self, acc: Account, debug=DEBUG) -> None:
-        balance_in_wei = self.balance_of_wei(acc)
-        if balance_in_wei > 0:
-            admin = Account(constants.SIGNER, constants.SIGNER_PKEY)
-            self.transfer(acc, admin, balance_in_wei)
-            if debug:
-                print(
-                    f"[Token] {acc.shorten_address} transferred {balance_in_wei/10**18} {self.symbol} back to admin"
-                )
-
 
 class Eth:
     def __init__(self):
@@ -195,41 +231,51 @@ class Eth:
         return conn.eth.get_balance(checksum_addr)
 
     def send_eth(self, sender: Account, dest: str, value: int, debug=DEBUG):
-        tx = {
-            "from": sender.address,
-            "to": dest,
-            "value": value,
-            "nonce": conn.eth.get_transaction_count(sender.address),
-            "gas": 0,
-            "gasPrice": conn.to_wei("30", "gwei"),
-        }
-
-        gas = conn.eth.estimate_gas(tx)
-        tx.update({"gas": gas})
-        signed = conn.eth.account.sign_transaction(tx, sender.private_key)
-
-        tx_hash = conn.eth.send_raw_transaction(signed.rawTransaction)
-        if debug:
-            print(
-                f"[ETH] {sender.shorten_address} transferred {value/10**18} ETH to {dest[:4] + '...' + dest[-4:]} (txHash: {tx_hash.hex()[:4] + '...' + tx_hash.hex()[-4:]})"
+        with tracer.span("eth.send_eth", account=sender.address, to=dest, value=value):
+            tx = builder.send_eth(
+                sender.address,
+                dest,
+                value,
+                nonce=nonces.next(sender.address),
+                gasPrice=conn.to_wei("30", "gwei"),
             )
+            tx_hash = sign_and_send(tx, sender.private_key)
+            if debug:
+                print(
+                    f"[ETH] {sender.shorten_address} transferred {value/10**18} ETH to {dest[:4] + '...' + dest[-4:]} (txHash: {tx_hash.hex()[:4] + '...' + tx_hash.hex()[-4:]})"
+                )
 
 
 class Sweeper(BaseModel):
     class Config:
         arbitrary_types_allowed = True
 
-    whitelist_token: List[Token] = None
+    whitelist_token: Any = None
     acc_list: List[Account] = None
     provider: Web3.HTTPProvider = None
-
-    def __init__(self):
+    prices: Any = None
+    costs: Any = None
+    keystore: Any = None
+    planner: Any = None
+    # (token or None for ETH, sender, nonce, hashes, amount) of sweep txs not mined yet
+    unsettled: Any = None
+    ledger: Any = None
+    # accounts left with a balance that was not swept, evaluated again per head
+    deferrals: Any = None
+
+    def __init__(self, prices=price_cache, costs=cost_model):
         super().__init__()
-        self.whitelist_token = []
+        self.planner = SweepPlanner(costs=costs)
+        self.deferrals = DeferredSweeps()
+        self.unsettled = deque(maxlen=10_000)
+        self.whitelist_token = TokenRegistry(prices=prices)
         self.acc_list = []
+        self.prices = prices
+        self.costs = costs
 
     def add_token(self, token: Token, debug=DEBUG):
-        self.whitelist_token.append(token)
+        if not self.whitelist_token.add(token):
+            return
         if debug:
             print(
                 f"[Sweeper] New token {token.symbol}({token.token_address}) added to whitelist"
@@ -240,20 +286,18 @@ class Sweeper(BaseModel):
         if debug:
             print(f"[Sweeper] New acc {acc.shorten_address} added to sweeper")
 
-    def remove_token(self, rm_token: Token, debug=DEBUG) -> bool:
-        for token in self.whitelist_token:
-            if token == rm_token:
-                self.whitelist_token.remove(token)
-                if debug:
-                    print(
-                        f"[Sweeper] Token {token.symbol}({token.token_address}) removed from whitelist"
-                    )
-                return True
+    def remove_token(self, rm_token: Token | str, debug=DEBUG) -> bool:
+        address = getattr(rm_token, "token_address", rm_token)
+        token = self.whitelist_token.remove(address)
+        if token is None:
+            if debug:
+                print(f"[Sweeper] {address} not found in whitelist")
+            return False
         if debug:
             print(
-                f"[Sweeper] {token.symbol}({token.token_address}) not found in whitelist"
+                f"[Sweeper] Token {token.symbol}({token.token_address}) removed from whitelist"
             )
-        return False
+        return True
 
     def print_balance(self, acc: Account):
         table = PrettyTable()
@@ -271,124 +315,231 @@ class Sweeper(BaseModel):
         print(table)
 
     def est_gas_price(self, debug=DEBUG):
-        curr_block = conn.eth.get_block_number()
-        tx_cnt = conn.eth.get_block_transaction_count(curr_block)
-
-        gas_prices = []
-        # estimate gas price from the first 10 tx
-        for idx in range(min(tx_cnt, 10)):
-            tx = conn.eth.get_transaction_by_block(curr_block, idx)
-            gas_prices.append(tx["gasPrice"])
-
-        median_gas_price = statistics.median(gas_prices)
-        if debug:
-            print(f"[Sweeper] median gas price from latest 10 tx: {median_gas_price}")
-        return median_gas_price
-
-    # send gas from the admin to the account
-    def send_gas(
-        self, sender: Account, dest: str, value: int = config.GAS_AMOUNT, debug=DEBUG
-    ):
-        eth = Eth()
-        eth.send_eth(sender, dest, value)
-        if debug:
-            print(
-                f"[Sweeper] {value/10**18} of ETH is sent to {dest[:4] + '...' + dest[-4:]} for the gas fee."
-            )
+        with tracer.span("sweeper.est_gas_price"):
+            curr_block = conn.eth.get_block_number()
+            tx_cnt = conn.eth.get_block_transaction_count(curr_block)
 
-    # return gas back to the admin
-    def withdraw_gas(self, sender: Account, dest: str = constants.SIGNER, debug=DEBUG):
-        eth = Eth()
-        current_eth_bal = eth.check_balance(sender)
-        tx = {
-            "from": sender.address,
-            "to": dest,
-            "value": 1,
-            "nonce": conn.eth.get_transaction_count(sender.address),
-            "gas": 0,
-            "gasPrice": 0,
-        }
-        gas = conn.eth.estimate_gas(tx)
-        gas_price = self.est_gas_price()
-        tx.update({"gas": gas, "gasPrice": gas_price})
-
-        # extra 0.3% for the buffer
-        total_gas = int(gas * gas_price * 1.1)
-        amount = current_eth_bal - total_gas
-
-        # only dust left, just leave it here
-        if amount < 0:
-            print(f"[Sweeper] Insuffient gas for account: {sender.address}")
-            return
+            gas_prices = []
+            # estimate gas price from the first 10 tx
+            for idx in range(min(tx_cnt, 10)):
+                tx = conn.eth.get_transaction_by_block(curr_block, idx)
+                gas_prices.append(tx["gasPrice"])
 
-        eth.send_eth(
-            sender,
-            dest,
-            amount,
-        )
+            # empty block, e.g. just mined on a local node
+            if not gas_prices:
+                return conn.eth.gas_price
 
-        if debug:
-            print(
-                f"[Sweeper] {amount/10**18} of ETH is returned back to admin from {sender.address}"
-            )
+            median_gas_price = statistics.median(gas_prices)
+            if debug:
+                print(
+                    f"[Sweeper] median gas price from latest 10 tx: {median_gas_price}"
+                )
+            return median_gas_price
 
     def get_balances_breakdown(self, acc: Account):
         if acc is None:
             return
-        balances = []
-        # @TODO Add pricefeed for ETH, now assuming every eth = $1 USD
-        eth = Eth()
-        eth_balance_wei = eth.check_balance(acc)
-        eth_balance = eth_balance_wei / 10**18 if eth_balance_wei > 0 else 0.0
-        balances.append({"token": "ETH", "amount": eth_balance})
+        with tracer.span("sweeper.get_balances_breakdown", account=acc.address):
+            balances = []
+            eth = Eth()
+            eth_balance_wei = eth.check_balance(acc)
+            eth_balance = eth_balance_wei / 10**18 if eth_balance_wei > 0 else 0.0
+            balances.append(
+                {
+                    "token": "ETH",
+                    "asset": None,
+                    "amount": eth_balance,
+                    "usd": eth_balance * self.prices.price("ETH"),
+                }
+            )
 
-        # @TODO Add pricefeed for tokens, now assuming every eth = $1 USD
-        for t in self.whitelist_token:
-            balance = t.balance_of(acc)
-            balances.append({"token": t.symbol, "amount": balance})
+            for t in self.whitelist_token:
+                balance = t.balance_of(acc)
+                balances.append(
+                    {
+                        "token": t.symbol,
+                        "asset": t,
+                        "amount": balance,
+                        "usd": balance * self.prices.price(t.symbol),
+                    }
+                )
 
-        return balances
+            return balances
+
+    # send the tokens (all whitelisted by default) and the leftover gas back to the admin, all at once,
+    # record=False leaves the receipts out of the cost model and the ledger, e.g. for a simulation
+    def sweep(
+        self,
+        acc: Account,
+        settle=lambda: None,
+        tokens=None,
+        gas_price=None,
+        record=True,
+    ):
+        tokens = self.whitelist_token if tokens is None else tokens
+        gas_price = self.est_gas_price() if gas_price is None else gas_price
+        plan = self.planner.plan(acc, tokens, int(gas_price))
+        sent = self.planner.submit(plan, acc)
+        if record and self.ledger is not None and plan.funding_block is not None:
+            self.ledger.record_funding(acc.address, plan.funding, plan.funding_block)
+        if record:
+            # by nonce, a bumped tx is mined under one of its replacement hashes
+            for (t, tx, amount), (_, tx_hash, _) in zip(plan.txs, sent):
+                hashes = pending_txs.hashes_of(acc.address, tx["nonce"]) or [tx_hash]
+                self.unsettled.append((t, acc.address, tx["nonce"], hashes, amount))
+
+        with tracer.span("sweeper.settle", account=acc.address):
+            settle()
+        if record:
+            self.process_receipts()
+
+    def mined_receipt(self, hashes: list) -> dict | None:
+        """
+        :param hashes: hashes broadcast for one nonce, see PendingTxManager
+        :return: receipt of the one that was mined, None if none was
+        """
+        for tx_hash in reversed(hashes):
+            try:
+                return conn.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+        return None
+
+    # learn transfer gas and record completed sweeps, txs not mined yet are kept for the next call
+    def process_receipts(self):
+        for _ in range(len(self.unsettled)):
+            try:
+                t, sender, nonce, hashes, amount = self.unsettled.popleft()
+            except IndexError:
+                # drained by another sweep thread
+                break
+            receipt = self.mined_receipt(hashes)
+            if receipt is None:
+                if conn.eth.get_transaction_count(sender) <= nonce:
+                    self.unsettled.append((t, sender, nonce, hashes, amount))
+                    continue
+                # mined meanwhile, or the nonce went to a tx not sent by us
+                receipt = self.mined_receipt(hashes)
+                if receipt is None:
+                    metrics.inc("sweeper.unsettled_lost")
+                    continue
+            if t is not None:
+                self.costs.record(t.token_address, receipt["gasUsed"])
+            elif receipt["status"] == 1:
+                # a drain's value is lowered on every bump of its sender
+                amount = conn.eth.get_transaction(receipt["transactionHash"])["value"]
+            if self.ledger is None:
+                continue
+            # paid from the account's ETH, reverted or not
+            self.ledger.record_fee(
+                receipt["from"],
+                receipt["gasUsed"] * receipt["effectiveGasPrice"],
+                receipt["blockNumber"],
+            )
+            if receipt["status"] == 1:
+                self.ledger.record_sweep(
+                    receipt["from"],
+                    decoder.NATIVE if t is None else t.token_address,
+                    amount,
+                    receipt["blockNumber"],
+                )
+
+    def accounts(self) -> Iterator[Account]:
+        """
+        :return: the accounts in memory, then the keystore's without their
+            private key, none is decrypted
+        """
+        yield from self.acc_list
+        if self.keystore is not None:
+            for address in self.keystore.addresses():
+                yield Account(Web3.to_checksum_address(address), None)
 
     def get_acc(self, address: str) -> Account | None:
+        if self.keystore is not None and address in self.keystore:
+            return self.keystore.get(address)
         for acc in self.acc_list:
             if acc.address.lower() == address.lower():
                 return Account(Web3.to_checksum_address(acc.address), acc.private_key)
 
-    def handle_new_tx(self, address: str):
-        print("[Sweeper] Start sweeping:", address)
-        acc = self.get_acc(address)
-        if acc is None:
-            print(f"[Sweeper] Account not found: {address}")
-            return
-        self.print_balance(acc)
+    def select_sweep(self, acc: Account) -> tuple | None:
+        """
+        Gas price, minimum amount and cost model checks of a sweep. An account
+        left with a balance is evaluated again later, see `deferrals`, and
+        swept without the checks once overdue for MAX_BLOCK.
+        :return: (tokens, gas price, whether the ETH is worth returning) of the
+            sweep to be sent now, no token for an ETH-only sweep, None if deferred
+        """
         breakdown = self.get_balances_breakdown(acc)
         total_amount_usd = sum(
-            [float(i["amount"]) for i in breakdown] if len(breakdown) > 0 else 0.0
+            [float(i["usd"]) for i in breakdown] if len(breakdown) > 0 else 0.0
         )
+        if not any(i["amount"] > 0 for i in breakdown):
+            self.deferrals.clear(acc.address)
+            return None
 
         est_gas = self.est_gas_price()
+        if self.deferrals.overdue(acc.address):
+            print(
+                f"[Sweeper] MAX_BLOCK reached, sweeping whatever the cost: {acc.address}"
+            )
+            self.deferrals.clear(acc.address)
+            tokens = [i["asset"] for i in breakdown[1:] if i["amount"] > 0]
+            return tokens, est_gas, breakdown[0]["amount"] > 0
+
         # Only sweep when gas is cheap
         if est_gas > config.MAX_GAS_PRICE:
             print(
                 f"[Sweeper] Gas price too high, current: {est_gas}, max: {config.MAX_GAS_PRICE}"
             )
+            self.deferrals.defer(acc.address)
             return None
 
         if total_amount_usd < config.MINIMUM_AMOUNT_USD:
             print(
                 f"[Sweeper] Insufficent balances. total balance in usd: {total_amount_usd}, min: {config.MINIMUM_AMOUNT_USD}"
             )
+            self.deferrals.defer(acc.address)
             return None
 
-        for t in self.whitelist_token:
-            t.withdraw_all(acc)
-
-        time.sleep(2)
-        self.withdraw_gas(sender=acc)
+        deferral = self.deferrals.get(acc.address)
+        saved = set() if deferral is None else set(deferral.saved)
+        # tokens from the rows, the whitelist may have been reloaded since
+        tokens, native, deferred = self.costs.select(
+            [i["asset"] for i in breakdown[1:]],
+            [i["usd"] for i in breakdown[1:]],
+            est_gas,
+            self.prices.price("ETH"),
+            native_usd=breakdown[0]["usd"],
+            saved=saved,
+        )
+        if deferred:
+            self.deferrals.defer(acc.address, saved)
+        else:
+            self.deferrals.clear(acc.address)
+        if not tokens and not native:
+            print(f"[Sweeper] Nothing worth its gas, sweep deferred: {acc.address}")
+            return None
+        # the planner returns the ETH after the tokens, or alone
+        return tokens, est_gas, native
 
-        print("[Sweeper] End of sweeping.")
-        self.print_balance(acc)
-        print("========================")
+    def handle_new_tx(self, address: str):
+        with tracer.span("sweeper.handle_new_tx", account=address):
+            print("[Sweeper] Start sweeping:", address)
+            acc = self.get_acc(address)
+            if acc is None:
+                print(f"[Sweeper] Account not found: {address}")
+                return
+            self.print_balance(acc)
+            selected = self.select_sweep(acc)
+            if selected is None:
+                return None
+            tokens, est_gas, _ = selected
+
+            self.sweep(acc, tokens=tokens, gas_price=est_gas)
+
+            print("[Sweeper] End of sweeping.")
+            self.print_balance(acc)
+            print("========================")
 
 
 class User(BaseModel):
@@ -0,0 +1,77 @@
+from collections import OrderedDict
+from typing import List
+from metrics import metrics
+import config
+
+DEBUG = True
+
+
+class DepositCoalescer:
+    """
+    Batches every deposit to an account that lands within `window` blocks of
+    its first one into a single sweep. Follow-up deposits are deferred into the
+    open window instead of being dropped, and only accounts with an open window
+    are kept in memory.
+    """
+
+    def __init__(
+        self,
+        window=config.COALESCE_WINDOW,
+        max_pending=config.COALESCE_MAX_PENDING,
+        publish=True,
+    ):
+        self.window = window
+        self.max_pending = max_pending
+        # publish queue stats to metrics, off for offline replays
+        self.publish = publish
+        # account -> block of its first deposit, oldest first
+        self.pending = OrderedDict()
+        self.deposits = 0
+        self.sweeps = 0
+
+    def add(self, account: str, block_number: int, count=1):
+        """
+        :param account: deposit address
+        :param block_number: block the deposit landed in
+        :param count: number of deposits to the account in that block
+        """
+        self.deposits += count
+        if account not in self.pending:
+            self.pending[account] = block_number
+        self.report()
+
+    def due(self, block_number: int, debug=DEBUG) -> List[str]:
+        """
+        :param block_number: current head
+        :return: accounts whose window closed, each to be swept once
+        """
+        ready = []
+        while self.pending:
+            account, first_block = next(iter(self.pending.items()))
+            overflow = len(self.pending) > self.max_pending
+            if block_number - first_block < self.window and not overflow:
+                break
+            self.pending.popitem(last=False)
+            ready.append(account)
+
+        self.sweeps += len(ready)
+        self.report()
+        if debug and ready:
+            print(
+                f"[Coalescer] {len(ready)} acc ready at block {block_number}, pending: {len(self.pending)}, ratio: {self.ratio():.2f}"
+            )
+        return ready
+
+    def ratio(self) -> float:
+        """
+        :return: deposits per sweep, 1.0 means nothing was coalesced
+        """
+        return self.deposits / self.sweeps if self.sweeps else 0.0
+
+    def report(self):
+        if not self.publish:
+            return
+        metrics.set("coalescer.queue_depth", len(self.pending))
+        metrics.set("coalescer.deposits", self.deposits)
+        metrics.set("coalescer.sweeps", self.sweeps)
+        metrics.set("coalescer.ratio", self.ratio())
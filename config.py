@@ -5,7 +5,121 @@ MINIMUM_AMOUNT_USD = 50  # minimum amount of token in USD to be swept
 # max gas price, stop sweeping when the network is in high traffic and gas is expensive
 MAX_GAS_PRICE = 30_000_000_000  # 30 gwei
 
+# a sent tx not mined after STUCK_BLOCKS blocks is replaced with fees raised FEE_BUMP times
+STUCK_BLOCKS = 3
+FEE_BUMP = 1.125  # nodes only accept replacements paying at least 10% more
+
+# replacements never pay more than this gas price
+MAX_BUMP_GAS_PRICE = 100_000_000_000  # 100 gwei
+
+# transfer gas assumed for a token until it is learned from receipts
+DEFAULT_TRANSFER_GAS = 50_000
+
+# a token is swept on its own once worth SWEEP_COST_RATIO times its transfer cost
+SWEEP_COST_RATIO = 10
+
 # amount of gas to be sent before sweeping
 GAS_AMOUNT = 500_000_000_000_000_000  # 0.5ETH or 200000000000000000 wei
 
+# contracts deployed by main.py per chain id and genesis hash, reused on restart
+DEPLOYMENTS_FILE = "deployments.json"
+
+# json whitelist of deployed tokens, re-read on a head after it changed, None to only use tokens added in code
+TOKEN_FILE = None
+
+# usd prices, {symbol: price} json read by prices.FilePriceSource
+PRICE_FILE = "prices.json"
+
+# cached prices are refreshed after PRICE_TTL seconds or PRICE_MAX_BLOCKS blocks
+PRICE_TTL = 60
+PRICE_MAX_BLOCKS = 5
+
+# "block": fetch each new head once with full transactions
+# "tx": fetch every transaction of the head one by one
+INGESTION_MODE = "block"
+
+# deposits to an account within this many blocks of its first one share a sweep
+COALESCE_WINDOW = 5
+
+# flush the oldest windows early once this many accounts are waiting
+COALESCE_MAX_PENDING = 10_000
+
+# accounts left with a deferred balance are evaluated again every this many blocks,
+# and swept whatever the cost before MAX_BLOCK
+DEFER_RECHECK_BLOCKS = 50
+
+# scan blocks from BACKFILL_FROM to the head at startup for missed deposits, None to skip
+BACKFILL_FROM = None
+
+# backfill range workers, and blocks per eth_getLogs chunk before the node asks for less
+BACKFILL_WORKERS = 4
+BACKFILL_CHUNK = 2_000
+
+# progress of an interrupted backfill, resumed on the next run of the same range
+BACKFILL_CHECKPOINT = "backfill.json"
+
+# sweep threads consuming the queue of due accounts, the head loop only enqueues
+SWEEP_WORKERS = 4
+
+# accounts waiting for a sweep at most, on a full queue the head loop
+# "block"s until a slot frees up or "drop"s the account until its next deposit
+SWEEP_QUEUE_SIZE = 1_000
+SWEEP_QUEUE_FULL = "block"
+
+# dry-run every sweep with anvil snapshot/revert and skip failing or unprofitable ones
+DRY_RUN = False
+
+# pull token balances with permits through one BatchSweeper transaction per head,
+# accounts holding ETH worth returning still get the regular sweep
+PERMIT_SWEEP = False
+
+# seconds a permit signed for a batch sweep stays valid
+PERMIT_DEADLINE = 3600
+
+# append every block's deposits and gas price to this jsonl file for replay.py, None to disable
+RECORD_FILE = None
+
+# "max": approve MAX_UINT256 once per (token, owner, spender), "exact": approve each pull's shortfall
+ALLOWANCE_POLICY = "max"
+
+# fraction of sweeps traced, see tracing.py; 0 disables tracing
+TRACE_SAMPLE_RATE = 0.01
+
+# append each sampled trace as an OTLP/JSON line to this file, None to only buffer spans
+TRACE_FILE = None
+
+# finished spans kept in memory for tracer.export_chrome()
+TRACE_MAX_SPANS = 10_000
+
+# memory-mapped keystore of the deposit keys, the wallets main.py creates are
+# added to it; None keeps them in memory. Password from KEYSTORE_PASSWORD
+KEYSTORE_FILE = None
+
+# append-only per-user ledger of deposits and completed sweeps, None to disable
+LEDGER_FILE = "ledger.bin"
+
+# number of sweeper worker processes, 1 sweeps inside the ingesting process
+WORKERS = 1
+
+# virtual nodes per worker on the consistent-hash ring
+SHARD_VNODES = 64
+
+# "http": anvil or any node on PORT, "eth_tester": in-process py-evm chain, no node needed
+BACKEND = "http"
+
+# seconds between polls for new blocks on the in-process backend
+HEAD_POLL_INTERVAL = 1
+
+# requests in flight to the node, adapted between min and max by limiter.AIMDLimiter
+RPC_INITIAL_CONCURRENCY = 8
+RPC_MIN_CONCURRENCY = 1
+RPC_MAX_CONCURRENCY = 64
+
+# seconds, a request slower than this and 3x its method's average latency shrinks
+# the concurrency limit like an error does, balance scans and backfills never do
+RPC_LATENCY_TARGET = 0.5
+
+# share of the concurrency limit balance scans and backfills may hold
+RPC_BULK_SHARE = 0.5
+
 PORT = 8888
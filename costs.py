@@ -0,0 +1,208 @@
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import List
+from metrics import metrics
+import config
+
+DEBUG = True
+
+# gas of a plain ETH transfer to an EOA, the return of an account's ETH
+ETH_TRANSFER_GAS = 21_000
+
+SWEEP = "sweep"
+BATCH = "batch"
+DEFER = "defer"
+
+
+class CostModel:
+    """
+    Decides per token whether a sweep is worth its gas. Transfer gas per token
+    is learned from receipts (exponential moving average), fees come from the
+    current gas price and token values from the price cache.
+
+    - sweep: worth at least `ratio` times its transfer cost on its own
+    - batch: covers its transfer cost, only sent along with a swept token
+    - defer: worth less than its transfer cost, left for a later sweep
+
+    An account's ETH is weighed the same way against its 21000 gas return.
+    """
+
+    def __init__(
+        self,
+        default_gas=config.DEFAULT_TRANSFER_GAS,
+        ratio=config.SWEEP_COST_RATIO,
+        alpha=0.2,
+    ):
+        self.default_gas = default_gas
+        self.ratio = ratio
+        self.alpha = alpha
+        # lowercased token address -> learned transfer gas
+        self.gas = {}
+
+    def record(self, token_address: str, gas_used: int):
+        """
+        :param token_address: token of a mined transfer
+        :param gas_used: gasUsed from its receipt
+        """
+        key = token_address.lower()
+        if key not in self.gas:
+            self.gas[key] = gas_used
+        else:
+            self.gas[key] += self.alpha * (gas_used - self.gas[key])
+
+    def transfer_gas(self, token_address: str) -> float:
+        return self.gas.get(token_address.lower(), self.default_gas)
+
+    def cost_usd(self, token_address: str, gas_price: int, eth_usd: float) -> float:
+        return self.transfer_gas(token_address) * gas_price / 10**18 * eth_usd
+
+    def decide(self, value_usd: float, cost_usd: float) -> str:
+        if value_usd <= 0 or value_usd < cost_usd:
+            return DEFER
+        if value_usd >= cost_usd * self.ratio:
+            return SWEEP
+        return BATCH
+
+    def decide_all(self, values_usd: List[float], costs_usd: List[float]) -> List:
+        """
+        :return: decision per value, batched ones deferred unless one is swept
+        """
+        decisions = [self.decide(v, c) for v, c in zip(values_usd, costs_usd)]
+        # batched tokens only ride along when something pays for the sweep
+        if SWEEP not in decisions:
+            decisions = [DEFER if d == BATCH else d for d in decisions]
+        return decisions
+
+    def select(
+        self,
+        tokens: List,
+        values_usd: List[float],
+        gas_price: int,
+        eth_usd: float,
+        native_usd: float = 0.0,
+        saved: set = None,
+        debug=DEBUG,
+    ) -> tuple:
+        """
+        :param tokens: whitelisted tokens held by the account
+        :param values_usd: usd value of the account's balance of each token
+        :param gas_price: current gas price in wei
+        :param eth_usd: usd price of ETH
+        :param native_usd: usd value of the account's ETH
+        :param saved: keys (token address, "ETH") of the account's deferred
+            balances already counted in costs.saved_usd, updated
+        :return: (tokens to be swept now, whether the ETH is worth returning,
+            whether a balance is left deferred), the whole account is deferred
+            when the first two are empty
+        """
+        tokens = list(tokens)
+        values = list(values_usd) + [native_usd]
+        costs = [self.cost_usd(t.token_address, gas_price, eth_usd) for t in tokens]
+        costs.append(ETH_TRANSFER_GAS * gas_price / 10**18 * eth_usd)
+        decisions = self.decide_all(values, costs)
+
+        selected = []
+        deferred = False
+        for t, decision, value, cost in zip(tokens + [None], decisions, values, costs):
+            metrics.inc(f"costs.{decision}")
+            if decision == DEFER:
+                if value > 0:
+                    deferred = True
+                    key = "ETH" if t is None else t.token_address.lower()
+                    # gas not spent on a transfer worth less than it, once per balance
+                    if saved is None or key not in saved:
+                        metrics.inc("costs.saved_usd", cost)
+                    if saved is not None:
+                        saved.add(key)
+                continue
+            if t is not None:
+                selected.append(t)
+            if debug:
+                symbol = "ETH" if t is None else t.symbol
+                print(f"[CostModel] {decision} {symbol}, est. cost: ${cost:.4f}")
+        return selected, decisions[-1] != DEFER, deferred
+
+
+@dataclass
+class Deferral:
+    # deposit address, as it was deferred
+    address: str
+    # head the account was first deferred at
+    since: int
+    # head it is evaluated again at
+    recheck: int
+    # deferred balances already counted in costs.saved_usd, see CostModel.select
+    saved: set = field(default_factory=set)
+
+
+class DeferredSweeps:
+    """
+    Accounts left with a balance that was not swept: deferred by the cost
+    model, the minimum amount or the gas price cap. They are evaluated again
+    every `recheck` blocks instead of waiting for a deposit that may never
+    come, and are overdue, swept whatever it costs, once `max_block` blocks
+    passed since they were first deferred. The default leaves MAX_BLOCK
+    minus the coalescing window the deposit already waited.
+    """
+
+    def __init__(
+        self,
+        recheck=config.DEFER_RECHECK_BLOCKS,
+        max_block=config.MAX_BLOCK - config.COALESCE_WINDOW,
+    ):
+        self.recheck = recheck
+        self.max_block = max_block
+        self._lock = Lock()
+        # lowercased address -> Deferral
+        self.accounts = {}
+        self.head = 0
+
+    def get(self, address: str) -> Deferral | None:
+        return self.accounts.get(address.lower())
+
+    def defer(self, address: str, saved: set = ()) -> Deferral:
+        """
+        :param saved: keys counted in costs.saved_usd by this evaluation
+        :return: the account's deferral, the first one is kept
+        """
+        with self._lock:
+            d = self.accounts.get(address.lower())
+            if d is None:
+                d = self.accounts[address.lower()] = Deferral(
+                    address=address, since=self.head, recheck=self.head + self.recheck
+                )
+            d.saved.update(saved)
+            metrics.set("costs.deferred_accounts", len(self.accounts))
+            return d
+
+    def clear(self, address: str):
+        """
+        the account was swept with nothing left deferred
+        """
+        with self._lock:
+            self.accounts.pop(address.lower(), None)
+            metrics.set("costs.deferred_accounts", len(self.accounts))
+
+    def overdue(self, address: str) -> bool:
+        d = self.get(address)
+        return d is not None and self.head >= d.since + self.max_block
+
+    def on_block(self, block_number: int) -> List[str]:
+        """
+        :param block_number: new head
+        :return: deferred accounts to be evaluated again now
+        """
+        due = []
+        with self._lock:
+            self.head = block_number
+            for d in self.accounts.values():
+                if d.recheck > block_number:
+                    continue
+                due.append(d.address)
+                deadline = d.since + self.max_block
+                nxt = block_number + self.recheck
+                d.recheck = min(nxt, deadline) if block_number < deadline else nxt
+        return due
+
+
+cost_model = CostModel()
@@ -0,0 +1,157 @@
+from dataclasses import dataclass, field
+from typing import Iterable, List
+from web3 import Web3
+import calldata
+import constants
+
+TRANSFER = bytes(calldata.TRANSFER)
+TRANSFER_FROM = bytes(calldata.TRANSFER_FROM)
+
+TRANSFER_TOPIC = Web3.keccak(text="Transfer(address,address,uint256)")
+
+# token field of native ETH deposits
+NATIVE = "ETH"
+
+
+@dataclass
+class Deposit:
+    token: str
+    sender: str
+    recipient: str
+    amount: int
+    block_number: int = None
+    # transaction the deposit was made in
+    tx_hash: bytes = None
+
+
+@dataclass
+class DepositEvent:
+    account: str
+    block_number: int
+    deposits: List[Deposit] = field(default_factory=list)
+
+
+def address_set(accounts) -> set:
+    """
+    :param accounts: deposit accounts or addresses
+    :return: set of lowercased deposit addresses for recipient lookups
+    """
+    return {getattr(a, "address", a).lower() for a in accounts}
+
+
+def token_set(tokens) -> set:
+    """
+    :param tokens: whitelisted tokens or token addresses
+    :return: set of lowercased token addresses for tx.to lookups
+    """
+    return {getattr(t, "token_address", t).lower() for t in tokens}
+
+
+def decode_transfer(tx, tokens: set) -> Deposit | None:
+    """
+    :param tx: transaction from get_transaction or a full block
+    :param tokens: lowercased whitelisted token addresses (see token_set) or
+        the sweeper's TokenRegistry
+    :return: the decoded transfer, None if tx is not a whitelisted token transfer
+    """
+    to = tx.get("to")
+    if to is None or to.lower() not in tokens:
+        return None
+
+    data = bytes(tx["input"])
+    selector = data[:4]
+    if selector == TRANSFER and len(data) >= 68:
+        sender = tx["from"]
+        recipient = data[16:36]
+        amount = int.from_bytes(data[36:68], "big")
+    elif selector == TRANSFER_FROM and len(data) >= 100:
+        sender = Web3.to_checksum_address(data[16:36])
+        recipient = data[48:68]
+        amount = int.from_bytes(data[68:100], "big")
+    else:
+        return None
+
+    return Deposit(
+        token=to,
+        sender=sender,
+        recipient=Web3.to_checksum_address(recipient),
+        amount=amount,
+        block_number=tx.get("blockNumber"),
+        tx_hash=tx.get("hash"),
+    )
+
+
+def decode_transfer_log(log) -> Deposit | None:
+    """
+    :param log: raw log from eth_getLogs
+    :return: the decoded ERC20 Transfer, None for any other event
+    """
+    topics = log["topics"]
+    if len(topics) != 3 or bytes(topics[0]) != TRANSFER_TOPIC:
+        return None
+    return Deposit(
+        token=log["address"],
+        sender=Web3.to_checksum_address(bytes(topics[1])[-20:]),
+        recipient=Web3.to_checksum_address(bytes(topics[2])[-20:]),
+        amount=int.from_bytes(bytes(log["data"]), "big"),
+        block_number=log["blockNumber"],
+        tx_hash=log.get("transactionHash"),
+    )
+
+
+def decode_block(txs: Iterable, tokens: set) -> List[Deposit]:
+    """
+    :param txs: transactions of a block
+    :param tokens: lowercased whitelisted token addresses (see token_set) or
+        the sweeper's TokenRegistry
+    :return: decoded whitelisted token transfers, in block order
+    """
+    deposits = []
+    for tx in txs:
+        deposit = decode_transfer(tx, tokens)
+        if deposit is not None:
+            deposits.append(deposit)
+    return deposits
+
+
+def decode_native(tx, accounts: set) -> Deposit | None:
+    """
+    :param tx: transaction from get_transaction or a full block
+    :param accounts: lowercased deposit addresses, see address_set
+    :return: the ETH deposit, None if tx does not send ETH to a deposit address
+    """
+    to = tx.get("to")
+    if not tx["value"] or to is None or to.lower() not in accounts:
+        return None
+    # gas top-ups from the admin are not deposits
+    if tx["from"].lower() == constants.SIGNER.lower():
+        return None
+    return Deposit(
+        token=NATIVE,
+        sender=tx["from"],
+        recipient=Web3.to_checksum_address(to),
+        amount=tx["value"],
+        block_number=tx.get("blockNumber"),
+        tx_hash=tx.get("hash"),
+    )
+
+
+def deposit_events(block, tokens: set, accounts: set) -> List[DepositEvent]:
+    """
+    :param block: block fetched with full_transactions=True
+    :param tokens: lowercased whitelisted token addresses (see token_set) or
+        the sweeper's TokenRegistry
+    :param accounts: lowercased deposit addresses, see address_set, or a Keystore
+    :return: one event per deposit account credited in the block
+    """
+    events = {}
+    for tx in block["transactions"]:
+        deposit = decode_transfer(tx, tokens) or decode_native(tx, accounts)
+        if deposit is None or deposit.recipient.lower() not in accounts:
+            continue
+        if deposit.recipient not in events:
+            events[deposit.recipient] = DepositEvent(
+                account=deposit.recipient, block_number=block["number"]
+            )
+        events[deposit.recipient].deposits.append(deposit)
+    return list(events.values())
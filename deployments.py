@@ -0,0 +1,123 @@
+import json
+import os
+from typing import Callable
+from web3 import Web3
+from network import conn
+from classes import Token
+import utils
+import constants
+import config
+import ERC20
+
+DEBUG = True
+
+
+def code_hash(code: bytes) -> str:
+    return Web3.keccak(code).hex()
+
+
+class DeploymentManifest:
+    """
+    Contracts deployed by the sweeper, per chain: the json file maps
+    "<chain id>:<genesis hash>" to {label: entry}, so a restarted sweeper
+    attaches to its contracts instead of redeploying them, and a reset or
+    different node gets a fresh set. An entry is reused only if the compiled
+    bytecode is unchanged and the code at its address still hashes to what
+    was deployed, checked once per start.
+    """
+
+    def __init__(self, path=config.DEPLOYMENTS_FILE, provider=conn):
+        self.path = path
+        self.provider = provider
+        self._key = None
+        self.manifest = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+
+    @property
+    def key(self) -> str:
+        if self._key is None:
+            genesis = self.provider.eth.get_block(0)["hash"]
+            self._key = f"{self.provider.eth.chain_id}:{genesis.hex()}"
+        return self._key
+
+    @property
+    def contracts(self) -> dict:
+        return self.manifest.setdefault(self.key, {})
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def attach_or_deploy(
+        self, label: str, bytecode: str, deploy: Callable[[], str], debug=DEBUG, **meta
+    ) -> str | None:
+        """
+        :param label: name of the contract in the manifest, e.g. its symbol
+        :param bytecode: creation bytecode, a new build is redeployed
+        :param deploy: deploys the contract, returns its address
+        :param meta: extra fields stored with the entry
+        :return: address of the reused or newly deployed contract
+        """
+        entry = self.contracts.get(label)
+        bytecode_hash = code_hash(bytes.fromhex(bytecode.removeprefix("0x")))
+        if entry is not None and entry["bytecode_hash"] == bytecode_hash:
+            code = self.provider.eth.get_code(entry["address"])
+            if code_hash(code) == entry["code_hash"]:
+                if debug:
+                    print(f"[Deployments] {label} reused at {entry['address']}")
+                return entry["address"]
+            if debug:
+                print(
+                    f"[Deployments] {label} at {entry['address']} changed, redeploying"
+                )
+
+        address = deploy()
+        if address is None:
+            return None
+        self.contracts[label] = {
+            "address": address,
+            "bytecode_hash": bytecode_hash,
+            "code_hash": code_hash(self.provider.eth.get_code(address)),
+            **meta,
+        }
+        self.save()
+        return address
+
+    def token(
+        self,
+        name: str,
+        symbol: str,
+        supply=constants.ERC20_SUPPLY,
+        decimals=18,
+        debug=DEBUG,
+    ) -> Token:
+        """
+        :return: the token of this chain's manifest, deployed if missing
+        """
+        deployed = []
+
+        def deploy():
+            token = Token(name, symbol, supply=supply, decimals=decimals)
+            deployed.append(token)
+            return token.token_address
+
+        address = self.attach_or_deploy(
+            symbol, ERC20.bytecode, deploy, debug, name=name, decimals=decimals
+        )
+        if deployed:
+            return deployed[0]
+        token = Token.at(address, symbol, decimals=decimals, name=name)
+        token.supply = supply
+        return token
+
+    def batch_sweeper(self, debug=DEBUG) -> str | None:
+        return self.attach_or_deploy(
+            "BatchSweeper",
+            ERC20.batch_sweeper_bytecode,
+            lambda: utils.create_batch_sweeper(self.provider),
+            debug,
+        )
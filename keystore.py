@@ -0,0 +1,211 @@
+import hashlib
+import mmap
+import os
+import heapq
+import struct
+from typing import Iterable, Iterator
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from web3 import Web3
+from account import Account
+
+MAGIC = b"SWKS"
+VERSION = 3
+# magic, version, flags, record count, kdf salt, password check
+HEADER = struct.Struct(">4sHHQ16s32s")
+ADDRESS_SIZE = 20
+NONCE_SIZE = 12
+KEY_SIZE = 32
+TAG_SIZE = 16
+# address, AES-GCM nonce, private key, AES-GCM tag, nonce and tag are zero
+# in a file without password
+RECORD_SIZE = ADDRESS_SIZE + NONCE_SIZE + KEY_SIZE + TAG_SIZE
+FLAG_ENCRYPTED = 1
+
+
+def derive_key(password: str, salt: bytes) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=2**14, r=8, p=1, dklen=32)
+
+
+def password_check(secret: bytes) -> bytes:
+    """
+    :return: value stored in the header to tell a wrong password on open
+    """
+    return hashlib.blake2b(b"password check", key=secret, digest_size=32).digest()
+
+
+def seal(aead: AESGCM | None, address: bytes, key: bytes) -> bytes:
+    """
+    :return: record of the key, encrypted and authenticated along with its
+        address when `aead` is given
+    """
+    if aead is None:
+        return address + bytes(NONCE_SIZE) + key + bytes(TAG_SIZE)
+    nonce = os.urandom(NONCE_SIZE)
+    return address + nonce + aead.encrypt(nonce, key, address)
+
+
+def to_bytes(address: str) -> bytes:
+    return bytes.fromhex(address[2:] if address[:2] in ("0x", "0X") else address)
+
+
+class Keystore:
+    """
+    Read-only deposit keystore backed by a memory-mapped file of fixed 80-byte
+    records (20-byte address, nonce, 32-byte private key, tag) sorted by
+    address. Lookups binary-search the mapping and Account objects are only
+    built on demand. Keys can be encrypted at rest with a password, AES-GCM
+    per record with the address as associated data, so a key altered or
+    moved to another address fails to decrypt.
+    """
+
+    def __init__(self, path: str, password: str = None):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, flags, count, salt, check = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a keystore file")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported keystore version {version}")
+        self.count = count
+        self.flags, self.salt, self.check = flags, salt, check
+        self._aead = None
+        if flags & FLAG_ENCRYPTED:
+            if password is None:
+                raise ValueError(f"{path} is encrypted, password required")
+            secret = derive_key(password, salt)
+            if password_check(secret) != check:
+                raise ValueError(f"{path}: wrong password")
+            self._aead = AESGCM(secret)
+        elif password is not None:
+            raise ValueError(f"{path} is not encrypted")
+
+    @classmethod
+    def write(cls, path: str, accounts: Iterable[Account], password: str = None):
+        """
+        :param path: keystore file to be created
+        :param accounts: accounts to be stored
+        :param password: encrypt private keys at rest when given
+        """
+        salt = os.urandom(16)
+        secret = derive_key(password, salt) if password is not None else None
+        flags = FLAG_ENCRYPTED if secret is not None else 0
+        check = password_check(secret) if secret is not None else bytes(32)
+        aead = AESGCM(secret) if secret is not None else None
+        records = [
+            seal(aead, address, key)
+            for address, key in sorted(
+                (to_bytes(acc.address), to_bytes(acc.private_key)) for acc in accounts
+            )
+        ]
+        cls._write_records(path, flags, salt, check, len(records), records)
+
+    @staticmethod
+    def _write_records(path, flags, salt, check, count, records: Iterable[bytes]):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, flags, count, salt, check))
+            for record in records:
+                f.write(record)
+        os.replace(tmp, path)
+
+    @classmethod
+    def merge(cls, path: str, accounts: Iterable[Account], password: str = None):
+        """
+        Add the accounts not in the keystore yet. The records already in it are
+        streamed over as they are, encrypted with the same key, and the file is
+        only rewritten when an account is new.
+        :return: the keystore opened
+        """
+        if not os.path.exists(path):
+            cls.write(path, accounts, password)
+            return cls(path, password)
+        current = cls(path, password)
+        new = {}
+        for acc in accounts:
+            address = to_bytes(acc.address)
+            if address not in new and current.find(acc.address) is None:
+                new[address] = to_bytes(acc.private_key)
+        if not new:
+            return current
+        added = (seal(current._aead, a, new[a]) for a in sorted(new))
+        cls._write_records(
+            path,
+            current.flags,
+            current.salt,
+            current.check,
+            current.count + len(new),
+            heapq.merge(current.records(), added),
+        )
+        current.close()
+        return cls(path, password)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, address: str) -> bool:
+        return self.find(address) is not None
+
+    def _offset(self, idx: int) -> int:
+        return HEADER.size + idx * RECORD_SIZE
+
+    def records(self) -> Iterator[bytes]:
+        """
+        :return: raw records in address order, keys left encrypted
+        """
+        for idx in range(self.count):
+            offset = self._offset(idx)
+            yield self._mm[offset : offset + RECORD_SIZE]
+
+    def address_at(self, idx: int) -> bytes:
+        offset = self._offset(idx)
+        return self._mm[offset : offset + ADDRESS_SIZE]
+
+    def find(self, address: str) -> int | None:
+        """
+        :param address: address in any case
+        :return: record index of the address, None if not in the keystore
+        """
+        target = to_bytes(address)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.address_at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self.address_at(lo) == target:
+            return lo
+        return None
+
+    def private_key_at(self, idx: int) -> str:
+        """
+        :raise ValueError: the record does not decrypt, altered on disk
+        """
+        record = self._mm[self._offset(idx) : self._offset(idx) + RECORD_SIZE]
+        address = record[:ADDRESS_SIZE]
+        nonce = record[ADDRESS_SIZE : ADDRESS_SIZE + NONCE_SIZE]
+        sealed = record[ADDRESS_SIZE + NONCE_SIZE :]
+        if self._aead is None:
+            return "0x" + sealed[:KEY_SIZE].hex()
+        try:
+            return "0x" + self._aead.decrypt(nonce, sealed, address).hex()
+        except InvalidTag:
+            raise ValueError(f"{self.path}: key of 0x{address.hex()} does not decrypt")
+
+    def account_at(self, idx: int) -> Account:
+        address = Web3.to_checksum_address(self.address_at(idx))
+        return Account(address, self.private_key_at(idx))
+
+    def get(self, address: str) -> Account | None:
+        idx = self.find(address)
+        return self.account_at(idx) if idx is not None else None
+
+    def addresses(self) -> Iterator[str]:
+        for idx in range(self.count):
+            yield "0x" + self.address_at(idx).hex()
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
@@ -0,0 +1,313 @@
+import os
+import queue
+import struct
+from threading import Lock
+from typing import Dict, Iterable
+import numpy as np
+from metrics import metrics
+import decoder
+import config
+
+DEBUG = True
+
+# record kinds
+DEPOSIT = 0
+SWEEP = 1
+USER = 2  # defines a user index, `ref` holds the uid
+TOKEN = 3  # defines a token index, `ref` holds the token address
+ACCOUNT = 4  # assigns the account in `ref` to `user`
+FEE = 5  # gas an account paid in ETH for its sweep txs
+FUNDING = 6  # ETH the admin sent an account to pay for its sweep
+
+# kinds summed per (user, token) and per token, in the order of the totals
+MOVES = (DEPOSIT, SWEEP, FEE, FUNDING)
+
+# kind, user index, token index, block, account (or definition), amount
+RECORD = struct.Struct(">BIHQ20s16s")
+DTYPE = np.dtype(
+    [
+        ("kind", "u1"),
+        ("user", ">u4"),
+        ("token", ">u2"),
+        ("block", ">u8"),
+        ("ref", "S20"),
+        # 128-bit amount as 4 big-endian 32-bit limbs, most significant first
+        ("amount", ">u4", (4,)),
+    ]
+)
+LIMB_SHIFTS = (96, 64, 32, 0)
+
+# user index of deposits to accounts no user owns
+UNOWNED = 0xFFFFFFFF
+# token of native ETH deposits
+ETH_ADDRESS = "0x" + "00" * 20
+
+
+def to_bytes(address: str) -> bytes:
+    return bytes.fromhex(address[2:])
+
+
+def limbs_to_int(limbs) -> int:
+    return sum(int(v) << s for v, s in zip(limbs, LIMB_SHIFTS))
+
+
+class DepositLedger:
+    """
+    Append-only log of detected deposits and completed sweeps per (user,
+    account, token), in fixed 51-byte records. Users and tokens are interned
+    to small indices by definition records written the first time they show
+    up. Gas the accounts paid and the admin's top-ups are recorded in ETH,
+    so the deposited ETH spent on fees is not left as unswept. Totals of
+    every move per (user, token) and per token are kept up to date on every
+    append, so a user's balance is a dict lookup, and are recomputed with
+    numpy from the file on start. Amounts must fit in 128 bits, larger or
+    negative ones are rejected and not recorded.
+    """
+
+    def __init__(self, path=config.LEDGER_FILE):
+        self.path = path
+        self._lock = Lock()
+        self.users = []
+        self.user_index = {}
+        self.tokens = []
+        self.token_index = {}
+        # lowercased account -> user index
+        self.owners = {}
+        # user index -> {token index: [deposited, swept, fees, funded]}
+        self.per_user = {}
+        # token index -> [deposited, swept, fees, funded], unowned accounts included
+        self.per_token = {}
+        self.records = 0
+        if os.path.exists(path):
+            self.rebuild()
+        self._file = open(path, "ab")
+
+    def rebuild(self, debug=DEBUG):
+        """
+        Recompute every total from the file
+        """
+        with open(self.path, "rb") as f:
+            data = f.read()
+        # a record cut short by a crash is dropped, appends continue after the last whole one
+        usable = len(data) - len(data) % RECORD.size
+        if usable != len(data):
+            os.truncate(self.path, usable)
+        rows = np.frombuffer(data[:usable], dtype=DTYPE)
+        self.records = len(rows)
+
+        for row in rows[rows["kind"] == USER]:
+            self.users.append(row["ref"].rstrip(b"\0").decode())
+        self.user_index = {uid: i for i, uid in enumerate(self.users)}
+        for row in rows[rows["kind"] == TOKEN]:
+            self.tokens.append("0x" + row["ref"].ljust(20, b"\0").hex())
+        self.token_index = {t: i for i, t in enumerate(self.tokens)}
+        for row in rows[rows["kind"] == ACCOUNT]:
+            self.owners["0x" + row["ref"].ljust(20, b"\0").hex()] = int(row["user"])
+
+        # sums indexed densely by user * tokens + token, unowned as the last user
+        n_users, n_tokens = len(self.users) + 1, max(len(self.tokens), 1)
+        for kind in MOVES:
+            moves = rows[rows["kind"] == kind]
+            users = moves["user"].astype(np.int64)
+            users[users == UNOWNED] = n_users - 1
+            idx = users * n_tokens + moves["token"]
+            # limb sums stay exact in uint64 up to 2**32 records
+            sums = np.zeros((n_users * n_tokens, 4), dtype=np.uint64)
+            np.add.at(sums, idx, moves["amount"].astype(np.uint64))
+            for i in np.flatnonzero(np.bincount(idx, minlength=len(sums))).tolist():
+                user, token = divmod(i, n_tokens)
+                amount = limbs_to_int(sums[i])
+                self.per_token.setdefault(token, [0] * len(MOVES))[
+                    MOVES.index(kind)
+                ] += amount
+                if user != n_users - 1:
+                    self._add(user, token, kind, amount)
+        if debug:
+            print(
+                f"[Ledger] rebuilt {self.records} records, {len(self.users)} users, {len(self.tokens)} tokens"
+            )
+
+    def _add(self, user: int, token: int, kind: int, amount: int):
+        totals = self.per_user.setdefault(user, {}).setdefault(token, [0] * len(MOVES))
+        totals[MOVES.index(kind)] += amount
+
+    def _write(self, kind, user, token, block, ref: bytes, amount: int):
+        self._file.write(
+            RECORD.pack(kind, user, token, block, ref, amount.to_bytes(16, "big"))
+        )
+        self.records += 1
+
+    def add_user(self, user):
+        """
+        :param user: User whose wallets are attributed to it
+        """
+        with self._lock:
+            if user.uid not in self.user_index:
+                ref = user.uid.encode()
+                if len(ref) > 20:
+                    raise ValueError(f"uid longer than 20 bytes: {user.uid}")
+                self.user_index[user.uid] = len(self.users)
+                self.users.append(user.uid)
+                self._write(USER, self.user_index[user.uid], 0, 0, ref, 0)
+            idx = self.user_index[user.uid]
+            for acc in user.wallets:
+                key = acc.address.lower()
+                if self.owners.get(key) != idx:
+                    self.owners[key] = idx
+                    self._write(ACCOUNT, idx, 0, 0, to_bytes(key), 0)
+
+    def _token(self, token: str) -> int:
+        key = ETH_ADDRESS if token == decoder.NATIVE else token.lower()
+        if key not in self.token_index:
+            self.token_index[key] = len(self.tokens)
+            self.tokens.append(key)
+            self._write(TOKEN, 0, self.token_index[key], 0, to_bytes(key), 0)
+        return self.token_index[key]
+
+    def _append(
+        self, kind: int, account: str, token: str, amount: int, block: int, debug=DEBUG
+    ):
+        if not 0 <= amount < 2**128:
+            metrics.inc("ledger.rejected")
+            if debug:
+                print(
+                    f"[Ledger] {amount} of {token} to {account} does not fit, not recorded"
+                )
+            return
+        with self._lock:
+            user = self.owners.get(account.lower(), UNOWNED)
+            t = self._token(token)
+            self._write(kind, user, t, block or 0, to_bytes(account), amount)
+            self.per_token.setdefault(t, [0] * len(MOVES))[MOVES.index(kind)] += amount
+            if user != UNOWNED:
+                self._add(user, t, kind, amount)
+
+    def record_deposit(self, deposit: decoder.Deposit):
+        self._append(
+            DEPOSIT,
+            deposit.recipient,
+            deposit.token,
+            deposit.amount,
+            deposit.block_number,
+        )
+
+    def record_deposits(self, deposits: Iterable[decoder.Deposit]):
+        for d in deposits:
+            self.record_deposit(d)
+
+    def record_sweep(self, account: str, token: str, amount: int, block: int):
+        """
+        :param token: token address, decoder.NATIVE for the ETH return
+        """
+        self._append(SWEEP, account, token, amount, block)
+
+    def record_fee(self, account: str, amount: int, block: int):
+        """
+        :param amount: wei of gas the account paid for a mined tx
+        """
+        self._append(FEE, account, decoder.NATIVE, amount, block)
+
+    def record_funding(self, account: str, amount: int, block: int):
+        """
+        :param amount: wei the admin sent the account for its sweep fees
+        """
+        self._append(FUNDING, account, decoder.NATIVE, amount, block)
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def moves(self, uid: str, token: str) -> tuple:
+        """
+        :return: (deposited, swept, fees, funded) wei of the user's accounts
+            in the token, fees and funding are ETH only
+        """
+        user = self.user_index.get(uid)
+        t = self.token_index.get(
+            ETH_ADDRESS if token == decoder.NATIVE else token.lower()
+        )
+        return tuple(self.per_user.get(user, {}).get(t, (0,) * len(MOVES)))
+
+    def totals(self, uid: str, token: str) -> tuple:
+        """
+        :return: (deposited, swept) wei of the user's accounts in the token
+        """
+        deposited, swept, _, _ = self.moves(uid, token)
+        return deposited, swept
+
+    def balance(self, uid: str, token: str) -> int:
+        """
+        :return: wei deposited by the user and not swept yet, nor paid as gas
+        """
+        deposited, swept, fees, funded = self.moves(uid, token)
+        return deposited + funded - swept - fees
+
+    def token_totals(self, token: str) -> tuple:
+        """
+        :return: (deposited, swept) wei of the token over every account
+        """
+        t = self.token_index.get(
+            ETH_ADDRESS if token == decoder.NATIVE else token.lower()
+        )
+        deposited, swept, _, _ = self.per_token.get(t, (0,) * len(MOVES))
+        return deposited, swept
+
+    def user_balances(self, uid: str) -> Dict[str, int]:
+        """
+        :return: {token address: unswept wei} of the user
+        """
+        user = self.user_index.get(uid)
+        return {
+            self.tokens[t]: deposited + funded - swept - fees
+            for t, (deposited, swept, fees, funded) in self.per_user.get(
+                user, {}
+            ).items()
+        }
+
+
+class LedgerOutbox:
+    """
+    Ledger of a sharded worker process: its records are put on a queue and
+    applied by the ingesting process, the only one writing the file
+    """
+
+    # methods a worker may call, applied under the same name
+    METHODS = ("record_sweep", "record_fee", "record_funding")
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+
+    def record_sweep(self, account: str, token: str, amount: int, block: int):
+        self.outbox.put(("record_sweep", (account, token, amount, block)))
+
+    def record_fee(self, account: str, amount: int, block: int):
+        self.outbox.put(("record_fee", (account, amount, block)))
+
+    def record_funding(self, account: str, amount: int, block: int):
+        self.outbox.put(("record_funding", (account, amount, block)))
+
+    def flush(self):
+        pass
+
+    @classmethod
+    def apply(cls, outbox, ledger: DepositLedger) -> int:
+        """
+        :param outbox: queue the workers' LedgerOutbox put their records on
+        :return: number of records applied to the ledger
+        """
+        applied = 0
+        while True:
+            try:
+                method, args = outbox.get_nowait()
+            except queue.Empty:
+                break
+            if method in cls.METHODS:
+                getattr(ledger, method)(*args)
+                applied += 1
+        if applied:
+            ledger.flush()
+        return applied
@@ -0,0 +1,174 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Condition
+from metrics import metrics
+import config
+
+DEBUG = True
+
+# priority classes, lower is served first
+HIGH = 0  # block ingestion and transaction submission
+NORMAL = 1
+BULK = 2  # balance scans, backfills
+
+# methods served as HIGH whatever the caller's class
+HIGH_METHODS = {
+    "eth_sendRawTransaction",
+    "eth_blockNumber",
+    "eth_getBlockByNumber",
+    "eth_getBlockByHash",
+}
+
+# JSON-RPC error codes nodes and providers use for "slow down"
+RATE_LIMIT_CODES = {-32005, 429}
+
+_priority = ContextVar("rpc_priority", default=NORMAL)
+
+
+@contextmanager
+def priority(cls: int):
+    """
+    Run the RPCs of the block with priority class `cls`, e.g. BULK for scans
+    """
+    token = _priority.set(cls)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class AIMDLimiter:
+    """
+    Caps the RPC requests in flight from this process. The cap grows by about
+    one per window of fast successful requests and is cut by `backoff` when a
+    request fails, is rate limited or is slow, at most once per `cooldown`
+    seconds. A request is slow above `latency_target` and `slow_factor` times
+    the moving average latency of its method, so methods slow by nature such
+    as full blocks do not count. BULK requests only cut it when they fail or
+    are rate limited, long scans do not starve the other classes.
+
+    A freed slot goes to the waiting request of the highest priority, and
+    BULK requests may hold at most `bulk_share` of the slots, so ingestion
+    and submission always find one soon.
+    """
+
+    def __init__(
+        self,
+        initial=config.RPC_INITIAL_CONCURRENCY,
+        min_limit=config.RPC_MIN_CONCURRENCY,
+        max_limit=config.RPC_MAX_CONCURRENCY,
+        latency_target=config.RPC_LATENCY_TARGET,
+        backoff=0.5,
+        bulk_share=config.RPC_BULK_SHARE,
+        cooldown=1.0,
+        slow_factor=3.0,
+        alpha=0.1,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.bulk_share = bulk_share
+        self.cooldown = cooldown
+        self.slow_factor = slow_factor
+        self.alpha = alpha
+        # method -> moving average latency in seconds
+        self.baseline = {}
+        self._cond = Condition()
+        self.in_flight = 0
+        self.bulk_in_flight = 0
+        # waiting requests per class
+        self.waiting = [0, 0, 0]
+        self._last_decrease = 0.0
+        self.report()
+
+    def _admissible(self, cls: int) -> bool:
+        if self.in_flight >= int(self.limit):
+            return False
+        # a higher class waiting gets the slot first
+        if any(self.waiting[c] for c in range(cls)):
+            return False
+        if cls == BULK:
+            return self.bulk_in_flight < max(1, int(self.limit * self.bulk_share))
+        return True
+
+    def acquire(self, cls: int):
+        with self._cond:
+            self.waiting[cls] += 1
+            try:
+                while not self._admissible(cls):
+                    self._cond.wait()
+            finally:
+                self.waiting[cls] -= 1
+            self.in_flight += 1
+            if cls == BULK:
+                self.bulk_in_flight += 1
+
+    def is_slow(self, cls: int, latency: float, method: str = None) -> bool:
+        """
+        :return: the request was slow for its method, the baseline is updated
+        """
+        baseline = self.baseline.get(method)
+        if baseline is None:
+            self.baseline[method] = latency
+            threshold = self.latency_target
+        else:
+            self.baseline[method] = baseline + self.alpha * (latency - baseline)
+            threshold = max(self.latency_target, self.slow_factor * baseline)
+        return cls != BULK and latency > threshold
+
+    def release(self, cls: int, latency: float, overloaded: bool, method: str = None):
+        """
+        :param latency: seconds the request took
+        :param overloaded: failed or rate limited
+        :param method: JSON-RPC method, latency is compared to its own baseline
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if cls == BULK:
+                self.bulk_in_flight -= 1
+            now = time.monotonic()
+            slow = not overloaded and self.is_slow(cls, latency, method)
+            if overloaded or slow:
+                if now - self._last_decrease >= self.cooldown:
+                    self._last_decrease = now
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    metrics.inc("rpc.decreases")
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.report()
+            self._cond.notify_all()
+
+    def report(self):
+        metrics.set("rpc.limit", int(self.limit))
+        metrics.set("rpc.in_flight", self.in_flight)
+
+    def middleware(self, make_request, w3):
+        """
+        web3 middleware, every request of the connection goes through it
+        """
+
+        def middleware(method, params):
+            cls = HIGH if method in HIGH_METHODS else _priority.get()
+            self.acquire(cls)
+            start = time.monotonic()
+            overloaded = True
+            try:
+                response = make_request(method, params)
+                error = response.get("error") if isinstance(response, dict) else None
+                overloaded = isinstance(error, dict) and (
+                    error.get("code") in RATE_LIMIT_CODES
+                    or "rate limit" in str(error.get("message", "")).lower()
+                )
+                return response
+            finally:
+                if overloaded:
+                    metrics.inc("rpc.overloaded")
+                self.release(cls, time.monotonic() - start, overloaded, method)
+
+        return middleware
+
+
+rpc_limiter = AIMDLimiter()
@@ -1,18 +1,37 @@
-from collections import defaultdict
+import os
 import random
 import time
+import config
 import constants
 import asyncio
+import decoder
+from coalescer import DepositCoalescer
+from shard import ShardPool
+from sweep_queue import SweepQueue
+from backfill import Backfill
+from prices import price_cache
+from allowances import allowances
+from pending import pending_txs
+from simulate import SweepSimulator, rpc
+from permit_sweep import PermitSweeper
+from replay import Recorder
 from web3 import AsyncWeb3
 from web3.providers import WebsocketProviderV2
-from classes import Token, Sweeper, User
+from web3.exceptions import BlockNotFound
+from classes import Sweeper, User
+from deployments import DeploymentManifest
+from ledger import DepositLedger
+from keystore import Keystore
 from account import Account
+import network
 from network import conn
+from calldata import builder
 from threading import Thread
-from config import PORT
+from concurrent.futures import ThreadPoolExecutor
 
 sweeper = Sweeper()
-wss_endpoint = f"ws://127.0.0.1:{PORT}"
+wss_endpoint = f"ws://127.0.0.1:{config.PORT}"
+recorder = Recorder(config.RECORD_FILE, sweeper) if config.RECORD_FILE else None
 
 user0 = User("peter2020")
 user1 = User("billy1999")
@@ -20,11 +39,22 @@ accounts_user0 = user0.add_wallets(5)
 accounts_user1 = user1.add_wallets(3)
 for acc in accounts_user0 + accounts_user1:
     sweeper.add_acc(acc)
+if config.KEYSTORE_FILE:
+    # deposit keys are read from the memory-mapped keystore, not kept as Account objects
+    sweeper.keystore = Keystore.merge(
+        config.KEYSTORE_FILE, sweeper.acc_list, os.environ.get("KEYSTORE_PASSWORD")
+    )
+    sweeper.acc_list = []
+if config.LEDGER_FILE:
+    sweeper.ledger = DepositLedger()
+    sweeper.ledger.add_user(user0)
+    sweeper.ledger.add_user(user1)
 
-# # deploy dummy tokens
-usdt = Token("Mock Tether USD", "MockUSDT")
-usdc = Token("Mock USD Coin", "MockUSDC")
-uni = Token("Mock Uniswap Token", "MockUNI")
+# # deploy dummy tokens, or reuse the ones deployed on this chain before
+deployments = DeploymentManifest()
+usdt = deployments.token("Mock Tether USD", "MockUSDT")
+usdc = deployments.token("Mock USD Coin", "MockUSDC")
+uni = deployments.token("Mock Uniswap Token", "MockUNI")
 tokens = [usdt, usdc, uni]
 
 
@@ -32,6 +62,8 @@ tokens = [usdt, usdc, uni]
 sweeper.add_token(usdt)
 sweeper.add_token(usdc)
 sweeper.add_token(uni)
+if config.TOKEN_FILE:
+    sweeper.whitelist_token.load()
 
 
 def main():
@@ -40,7 +72,7 @@ def main():
     cnt = 0
     while True:
         random_token = random.choice(tokens)
-        random_account = random.choice(sweeper.acc_list)
+        random_account = random.choice(accounts_user0 + accounts_user1)
         random_amount = int(random.uniform(10, 500) * 10**18)
 
         random_token.transfer(signer, random_account, random_amount)
@@ -51,23 +83,157 @@ def main():
             break
 
 
-async def ws_v2_subscription_context_manager_example():
-    last_update = defaultdict(int)
+def succeeded(deposits, block_number: int) -> list:
+    """
+    :param deposits: deposits decoded from the block's transactions
+    :return: the deposits whose transaction did not revert, a reverted call
+        still decodes as a transfer
+    """
+    if not deposits:
+        return []
+    try:
+        # every receipt of the block in one request
+        status = {
+            bytes.fromhex(r["transactionHash"][2:]): int(r["status"], 16)
+            for r in rpc("eth_getBlockReceipts", [hex(block_number)])
+        }
+    except Exception:
+        # node without eth_getBlockReceipts, one receipt per deposit tx
+        status = {}
+        for d in deposits:
+            if bytes(d.tx_hash) not in status:
+                receipt = conn.eth.get_transaction_receipt(d.tx_hash)
+                status[bytes(d.tx_hash)] = receipt["status"]
+    return [d for d in deposits if status.get(bytes(d.tx_hash)) == 1]
+
+
+def block_recipients(head) -> dict:
+    """
+    :param head: newHeads subscription result
+    :return: {deposit address: number of deposits} credited in the head
+    """
+    accounts = sweeper.keystore or decoder.address_set(sweeper.acc_list)
+    whitelist = sweeper.whitelist_token
+    if config.INGESTION_MODE == "block":
+        block = conn.eth.get_block(head["number"], full_transactions=True)
+        events = decoder.deposit_events(block, whitelist, accounts)
+        if recorder is not None:
+            recorder.record(block, events)
+        if sweeper.ledger is not None:
+            deposits = [d for e in events for d in e.deposits]
+            sweeper.ledger.record_deposits(succeeded(deposits, head["number"]))
+            sweeper.ledger.flush()
+        return {e.account: len(e.deposits) for e in events}
+
+    txs = [conn.eth.get_transaction(i) for i in head["transactions"]]
+    recipients = {}
+    deposits = []
+    for deposit in decoder.decode_block(txs, whitelist):
+        if deposit.recipient.lower() in accounts:
+            recipients[deposit.recipient] = recipients.get(deposit.recipient, 0) + 1
+            deposits.append(deposit)
+    if sweeper.ledger is not None:
+        sweeper.ledger.record_deposits(succeeded(deposits, head["number"]))
+        sweeper.ledger.flush()
+    return recipients
+
+
+def canonical(head) -> bool:
+    """
+    :return: the head is still part of the chain, a dry run reverts the
+        blocks it mined and the subscription delivers them anyway
+    """
+    # a dry run in progress holds the lock until its blocks are reverted
+    with network.send_lock:
+        try:
+            return conn.eth.get_block(head["number"])["hash"] == head["hash"]
+        except BlockNotFound:
+            return False
+
+
+async def new_heads():
+    """
+    newHeads over websocket, or polled blocks for the in-process backend
+    """
+    if config.BACKEND == "eth_tester":
+        last = conn.eth.block_number
+        while True:
+            await asyncio.sleep(config.HEAD_POLL_INTERVAL)
+            latest = conn.eth.block_number
+            for n in range(last + 1, latest + 1):
+                yield conn.eth.get_block(n)
+            last = latest
+
     async with AsyncWeb3.persistent_websocket(WebsocketProviderV2(wss_endpoint)) as w3:
         await w3.eth.subscribe("newHeads")
         async for response in w3.ws.process_subscriptions():
-            tx_hashes = [i.hex() for i in response["result"]["transactions"]]
-            for txh in tx_hashes:
-                tx = conn.eth.get_transaction(txh)
-                _to = "0x" + tx["input"].hex()[34:74]
-                if _to and _to.lower() != constants.SIGNER.lower() and _to != "0x":
-                    tx_block = int(tx["blockNumber"])
-                    if tx_block - last_update[_to] > 5:
-                        sweeper.handle_new_tx(_to)
-                    last_update[_to] = tx_block
+            yield response["result"]
+
+
+async def ws_v2_subscription_context_manager_example(pool: ShardPool = None):
+    coalescer = DepositCoalescer()
+    price_cache.start()
+    if pool is not None:
+        # keystore accounts by address, the workers read their keys from the file
+        keystore = sweeper.keystore
+        accounts = keystore.addresses() if keystore is not None else sweeper.acc_list
+        for acc in accounts:
+            pool.add_account(acc)
+        sweep = pool.dispatch
+    elif config.DRY_RUN:
+        # simulations snapshot the whole node, one at a time
+        queue = SweepQueue(SweepSimulator(sweeper).handle_new_tx, workers=1)
+        queue.start()
+        sweep = queue.put
+    else:
+        queue = SweepQueue(sweeper.handle_new_tx)
+        queue.start()
+        sweep = queue.put
+    if config.BACKFILL_FROM is not None:
+        backfill = Backfill(sweeper)
+        Thread(
+            target=backfill.run,
+            args=(config.BACKFILL_FROM,),
+            kwargs={"on_deposits": sweep},
+            daemon=True,
+        ).start()
+    permit_sweeper = None
+    if config.PERMIT_SWEEP:
+        permit_sweeper = PermitSweeper(
+            sweeper, deployments.batch_sweeper(), fallback=sweep
+        )
+        # one batch at a time, each waits for its receipt
+        permit_batches = ThreadPoolExecutor(1)
+    async for head in new_heads():
+        if config.DRY_RUN and not await asyncio.to_thread(canonical, head):
+            continue
+        price_cache.on_block(head["number"])
+        builder.on_block(head["number"])
+        allowances.on_block(head["number"])
+        sweeper.whitelist_token.on_block(head["number"])
+        pending_txs.on_block(head["number"])
+        if pool is not None:
+            pool.on_block(head["number"])
+        sweeper.process_receipts()
+        for _to, cnt in block_recipients(head).items():
+            coalescer.add(_to, head["number"], cnt)
+        due = coalescer.due(head["number"])
+        # deferred balances are evaluated again, overdue ones swept
+        queued = {a.lower() for a in due}
+        for address in sweeper.deferrals.on_block(head["number"]):
+            if address.lower() not in queued:
+                due.append(address)
+        if permit_sweeper is not None:
+            permit_batches.submit(permit_sweeper.handle_new_txs, due)
+            continue
+        for _to in due:
+            # a full queue may block, off the event loop so the websocket is served
+            await asyncio.to_thread(sweep, _to)
 
 
 if __name__ == "__main__":
+    # workers are forked before any thread starts
+    pool = ShardPool(tokens, ledger=sweeper.ledger) if config.WORKERS > 1 else None
     Thread(target=main).start()
-    asyncio.run(ws_v2_subscription_context_manager_example())
+    asyncio.run(ws_v2_subscription_context_manager_example(pool))
     # main()
@@ -0,0 +1,31 @@
+from threading import Lock
+
+
+class Metrics:
+    """
+    Process-wide counters and gauges, read with snapshot()
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.counters = {}
+        self.gauges = {}
+
+    def inc(self, name: str, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def get(self, name: str, default=0):
+        with self._lock:
+            return self.gauges.get(name, self.counters.get(name, default))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.counters, **self.gauges}
+
+
+metrics = Metrics()
@@ -1,7 +1,88 @@
+import requests
+from threading import Lock, RLock
 from web3 import Web3
 from web3.middleware import geth_poa_middleware
-from config import PORT
+from config import BACKEND, PORT
+import constants
+from limiter import rpc_limiter
 
 endpoint = f"http://127.0.0.1:{PORT}"
-conn = Web3(Web3.HTTPProvider(endpoint))
-conn.middleware_onion.inject(geth_poa_middleware, layer=0)
+
+# held around every broadcast, and by simulate.py for a whole simulation so
+# no other transaction lands in a snapshot that is about to be reverted
+send_lock = RLock()
+
+
+TX_METHODS = {
+    "eth_getTransactionByHash",
+    "eth_getTransactionByBlockNumberAndIndex",
+    "eth_getTransactionByBlockHashAndIndex",
+}
+BLOCK_METHODS = {"eth_getBlockByNumber", "eth_getBlockByHash"}
+
+
+def json_rpc_tx(tx: dict) -> dict:
+    """
+    eth-tester returns some transactions with snake_case keys and `data`
+    instead of `input`, rename them the way a node returns them
+    """
+    renamed = {}
+    for key, value in tx.items():
+        head, *rest = key.split("_")
+        renamed[head + "".join(i.title() for i in rest)] = value
+    renamed.setdefault("input", renamed.get("data", b""))
+    return renamed
+
+
+def in_process_provider(funding=constants.IN_PROCESS_FUNDING):
+    """
+    :return: provider of an in-process py-evm chain, the signer pre-funded
+    """
+    from eth_tester import EthereumTester, PyEVMBackend
+    from web3.providers.eth_tester import EthereumTesterProvider
+
+    class LockedEthereumTesterProvider(EthereumTesterProvider):
+        # py-evm is not thread safe, the traffic thread and the block loop share it
+        _lock = Lock()
+
+        def make_request(self, method, params):
+            with self._lock:
+                response = super().make_request(method, params)
+            result = response.get("result")
+            if method in TX_METHODS and isinstance(result, dict):
+                response["result"] = json_rpc_tx(result)
+            elif method in BLOCK_METHODS and isinstance(result, dict):
+                result["transactions"] = [
+                    json_rpc_tx(tx) if isinstance(tx, dict) else tx
+                    for tx in result["transactions"]
+                ]
+            return response
+
+    tester = EthereumTester(PyEVMBackend())
+    tester.send_transaction(
+        {
+            "from": tester.get_accounts()[0],
+            "to": constants.SIGNER,
+            "value": funding,
+            "gas": 21_000,
+        }
+    )
+    return LockedEthereumTesterProvider(tester)
+
+
+if BACKEND == "eth_tester":
+    conn = Web3(in_process_provider())
+else:
+    conn = Web3(Web3.HTTPProvider(endpoint))
+    conn.middleware_onion.inject(geth_poa_middleware, layer=0)
+conn.middleware_onion.add(rpc_limiter.middleware, "limiter")
+
+
+def reconnect():
+    """
+    Give `conn` a fresh HTTP session, e.g. in a forked worker so it does not
+    share the parent's connection pool
+    """
+    if BACKEND == "eth_tester":
+        return
+    conn.provider = Web3.HTTPProvider(endpoint, session=requests.Session())
@@ -0,0 +1,92 @@
+from threading import Lock
+import network
+from network import conn
+from pending import pending_txs
+from tracing import tracer
+
+
+class NonceManager:
+    """
+    Hands out consecutive nonces per sender without asking the node every
+    time. `shared` maps addresses used by several processes (the admin) to a
+    multiprocessing.Value, so those nonces stay unique across workers.
+    """
+
+    def __init__(self, provider=conn, shared: dict = None):
+        self.provider = provider
+        self.shared = {k.lower(): v for k, v in (shared or {}).items()}
+        self._lock = Lock()
+        self._next = {}
+
+    def next(self, address: str) -> int:
+        """
+        :param address: sender address
+        :return: nonce to be used by the sender's next transaction
+        """
+        key = address.lower()
+        if key in self.shared:
+            return self._next_shared(address, self.shared[key])
+
+        with self._lock:
+            if key not in self._next:
+                self._next[key] = self.pending_count(address)
+            nonce = self._next[key]
+            self._next[key] = nonce + 1
+            return nonce
+
+    def _next_shared(self, address: str, value) -> int:
+        with value.get_lock():
+            # -1: not fetched from the node yet
+            if value.value < 0:
+                value.value = self.pending_count(address)
+            nonce = value.value
+            value.value = nonce + 1
+            return nonce
+
+    def share(self, address: str, value):
+        """
+        :param address: sender used by several processes
+        :param value: multiprocessing.Value("q", -1) shared by those processes
+        """
+        with self._lock:
+            self._next.pop(address.lower(), None)
+            self.shared[address.lower()] = value
+
+    def pending_count(self, address: str) -> int:
+        return self.provider.eth.get_transaction_count(address, "pending")
+
+    def reset(self, address: str):
+        """
+        Forget the local nonce of the sender, e.g. after a failed broadcast,
+        the next call re-reads it from the node
+        """
+        key = address.lower()
+        if key in self.shared:
+            with self.shared[key].get_lock():
+                self.shared[key].value = -1
+            return
+        with self._lock:
+            self._next.pop(key, None)
+
+
+nonces = NonceManager()
+
+
+def sign_and_send(tx: dict, private_key: str, provider=conn, drain=False):
+    """
+    :param tx: transaction with a nonce from `nonces`
+    :param private_key: key of tx["from"]
+    :param drain: tx returns the sender's leftover ETH, its value is lowered
+        when a fee of the sender is bumped
+    :return: transaction hash
+    """
+    with tracer.span("tx.sign_and_send", account=tx["from"], nonce=tx["nonce"]):
+        signed = provider.eth.account.sign_transaction(tx, private_key)
+        try:
+            with network.send_lock:
+                tx_hash = provider.eth.send_raw_transaction(signed.rawTransaction)
+        except Exception:
+            nonces.reset(tx["from"])
+            raise
+    pending_txs.track(tx, private_key, tx_hash, drain=drain)
+    return tx_hash
@@ -0,0 +1,247 @@
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Iterable
+import network
+from network import conn
+from metrics import metrics
+import config
+
+DEBUG = True
+
+# fee fields raised on a replacement, legacy or EIP-1559
+FEE_FIELDS = ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+
+def max_fee(tx: dict) -> int:
+    """
+    :return: highest fee per gas the tx may pay, legacy or EIP-1559
+    """
+    return tx.get("maxFeePerGas", tx.get("gasPrice", 0))
+
+
+@dataclass
+class PendingTx:
+    tx: dict
+    private_key: str
+    tx_hash: bytes
+    sent_at: float
+    # first head seen after the (re)broadcast
+    sent_block: int = None
+    # time it was first seen stuck, counted as blocked until mined
+    stuck_at: float = None
+    bumps: int = 0
+    hashes: list = field(default_factory=list)
+    # returns the sender's leftover ETH, re-planned on every bump of the sender
+    drain: bool = False
+
+
+class PendingTxManager:
+    """
+    Tracks every transaction sent through sign_and_send by (sender, nonce).
+    One not mined STUCK_BLOCKS blocks after it was (re)broadcast is replaced
+    with the same nonce and fees raised by FEE_BUMP, up to MAX_BUMP_GAS_PRICE,
+    since it blocks every later nonce of its sender. A drain tx sending the
+    sender's leftover ETH is replaced along with it, its value lowered to
+    what the sender still has after the raised fees.
+    """
+
+    def __init__(
+        self,
+        provider=conn,
+        stuck_blocks=config.STUCK_BLOCKS,
+        bump=config.FEE_BUMP,
+        cap=config.MAX_BUMP_GAS_PRICE,
+    ):
+        self.provider = provider
+        self.stuck_blocks = stuck_blocks
+        self.bump = bump
+        self.cap = cap
+        self._lock = Lock()
+        # (lowercased sender, nonce) -> PendingTx
+        self.pending = {}
+
+    def track(self, tx: dict, private_key: str, tx_hash: bytes, drain=False):
+        """
+        :param tx: transaction just broadcast
+        :param private_key: key of tx["from"], kept to sign replacements
+        :param tx_hash: hash returned by the node
+        :param drain: tx returns the sender's leftover ETH
+        """
+        p = PendingTx(
+            tx=dict(tx),
+            private_key=private_key,
+            tx_hash=tx_hash,
+            sent_at=time.monotonic(),
+            hashes=[tx_hash],
+            drain=drain,
+        )
+        with self._lock:
+            self.pending[(tx["from"].lower(), tx["nonce"])] = p
+            metrics.set("pending.txs", len(self.pending))
+
+    def hashes_of(self, sender: str, nonce: int) -> list | None:
+        """
+        :return: every hash broadcast for the sender's nonce, oldest first,
+            the list grows with each replacement, None if not tracked
+        """
+        with self._lock:
+            p = self.pending.get((sender.lower(), nonce))
+        return None if p is None else p.hashes
+
+    def bumped_fees(self, tx: dict) -> dict | None:
+        """
+        :return: raised fee fields, None if the cap leaves no room for a
+            replacement the node would accept
+        """
+        fees = {}
+        for name in FEE_FIELDS:
+            if name not in tx:
+                continue
+            raised = min(int(tx[name] * self.bump) + 1, self.cap)
+            if name == "gasPrice":
+                # catch up with the network when it moved further than the bump
+                raised = min(max(raised, self.provider.eth.gas_price), self.cap)
+            if raised < tx[name] * self.bump:
+                return None
+            fees[name] = raised
+        return fees
+
+    def drain_value(self, p: PendingTx, tx: dict) -> int:
+        """
+        :param tx: replacement of the drain tx p with raised fees
+        :return: wei the sender can still return after the fees and values of
+            its other pending txs and the replacement's own fee
+        """
+        sender = p.tx["from"]
+        confirmed = self.provider.eth.get_transaction_count(sender, "latest")
+        with self._lock:
+            others = [
+                o.tx
+                for (s, nonce), o in self.pending.items()
+                if s == sender.lower() and nonce >= confirmed and o is not p
+            ]
+        spent = sum(o["gas"] * max_fee(o) + o.get("value", 0) for o in others)
+        balance = self.provider.eth.get_balance(sender, "latest")
+        return balance - spent - tx["gas"] * max_fee(tx)
+
+    def replace(self, p: PendingTx, block_number: int, debug=DEBUG) -> bool:
+        """
+        :return: whether the replacement was accepted
+        """
+        fees = self.bumped_fees(p.tx)
+        if fees is None:
+            metrics.inc("pending.capped")
+            if debug:
+                print(
+                    f"[Pending] nonce {p.tx['nonce']} of {p.tx['from'][:6]}... stuck at the fee cap"
+                )
+            return False
+        tx = {**p.tx, **fees}
+        if p.drain:
+            tx["value"] = self.drain_value(p, tx)
+            if tx["value"] <= 0:
+                # the raised fees took the rest, left to be dropped by the node
+                metrics.inc("pending.drain_dropped")
+                self.forget([p.tx_hash])
+                if debug:
+                    print(
+                        f"[Pending] nonce {tx['nonce']} of {tx['from'][:6]}... has no ETH left to return"
+                    )
+                return False
+        signed = self.provider.eth.account.sign_transaction(tx, p.private_key)
+        try:
+            with network.send_lock:
+                tx_hash = self.provider.eth.send_raw_transaction(signed.rawTransaction)
+        except Exception as e:
+            # most likely mined meanwhile, the next block drops it
+            if debug:
+                print(f"[Pending] replacement rejected: {e}")
+            return False
+        p.tx, p.tx_hash, p.sent_block = tx, tx_hash, block_number
+        p.bumps += 1
+        p.hashes.append(tx_hash)
+        metrics.inc("pending.bumped")
+        if debug:
+            print(
+                f"[Pending] nonce {tx['nonce']} of {tx['from'][:6]}... replaced with {fees} (txHash: {tx_hash.hex()[:4] + '...' + tx_hash.hex()[-4:]})"
+            )
+        return True
+
+    def on_block(self, block_number: int, debug=DEBUG):
+        """
+        Drop mined transactions, replace the stuck ones. A sender's
+        transaction is mined once its confirmed nonce count is past it.
+        """
+        with self._lock:
+            items = list(self.pending.items())
+        if not items:
+            return
+
+        confirmed = {}
+        now = time.monotonic()
+        stuck = 0
+        replaced = set()
+        for (sender, nonce), p in items:
+            if id(p) in replaced:
+                continue
+            if sender not in confirmed:
+                confirmed[sender] = self.provider.eth.get_transaction_count(
+                    p.tx["from"], "latest"
+                )
+            if nonce < confirmed[sender]:
+                with self._lock:
+                    self.pending.pop((sender, nonce), None)
+                if p.stuck_at is not None:
+                    metrics.inc("pending.blocked_seconds", now - p.stuck_at)
+                continue
+            if p.sent_block is None:
+                p.sent_block = block_number
+            if block_number - p.sent_block < self.stuck_blocks:
+                continue
+            stuck += 1
+            if p.stuck_at is None:
+                p.stuck_at = now
+            if not self.replace(p, block_number, debug) or p.drain:
+                continue
+            replaced.add(id(p))
+            # the sender's drain can no longer pay for itself at the raised fee
+            for (s, n), d in items:
+                if s == sender and n > nonce and d.drain and id(d) not in replaced:
+                    if self.replace(d, block_number, debug):
+                        replaced.add(id(d))
+
+        with self._lock:
+            metrics.set("pending.txs", len(self.pending))
+        metrics.set("pending.stuck", stuck)
+
+    def hashes(self) -> set:
+        """
+        :return: current hashes of the tracked transactions
+        """
+        with self._lock:
+            return {bytes(p.tx_hash) for p in self.pending.values()}
+
+    def forget(self, tx_hashes: Iterable[bytes]):
+        """
+        Stop tracking the transactions, e.g. after evm_revert dropped them,
+        so they are not re-broadcast
+        """
+        hashes = {bytes(h) for h in tx_hashes}
+        with self._lock:
+            for k, p in list(self.pending.items()):
+                if bytes(p.tx_hash) in hashes:
+                    del self.pending[k]
+
+    def blocked_seconds(self) -> float:
+        """
+        :return: time spent behind stuck transactions, the ones still stuck
+            included
+        """
+        now = time.monotonic()
+        with self._lock:
+            ongoing = sum(now - p.stuck_at for p in self.pending.values() if p.stuck_at)
+        return metrics.get("pending.blocked_seconds") + ongoing
+
+
+pending_txs = PendingTxManager()
@@ -0,0 +1,255 @@
+import time
+from typing import List
+from eth_account.messages import encode_typed_data
+from web3.logs import DISCARD
+from classes import Sweeper
+from account import Account
+from network import conn
+from calldata import builder
+from nonces import nonces, sign_and_send
+from metrics import metrics
+import constants
+import config
+import utils
+import ERC20
+
+DEBUG = True
+
+PERMIT_TYPES = {
+    "Permit": [
+        {"name": "owner", "type": "address"},
+        {"name": "spender", "type": "address"},
+        {"name": "value", "type": "uint256"},
+        {"name": "nonce", "type": "uint256"},
+        {"name": "deadline", "type": "uint256"},
+    ]
+}
+
+
+def sign_permit(
+    token_name: str,
+    token_address: str,
+    chain_id: int,
+    owner: Account,
+    spender: str,
+    value: int,
+    nonce: int,
+    deadline: int,
+):
+    """
+    Sign an EIP-2612 permit offline with the owner's key
+    :return: v, r, s
+    """
+    signable = encode_typed_data(
+        domain_data={
+            "name": token_name,
+            "version": "1",
+            "chainId": chain_id,
+            "verifyingContract": token_address,
+        },
+        message_types=PERMIT_TYPES,
+        message_data={
+            "owner": owner.address,
+            "spender": spender,
+            "value": value,
+            "nonce": nonce,
+            "deadline": deadline,
+        },
+    )
+    signed = conn.eth.account.sign_message(signable, owner.private_key)
+    return signed.v, signed.r.to_bytes(32, "big"), signed.s.to_bytes(32, "big")
+
+
+class PermitSweeper:
+    """
+    Sweeps many accounts in a single admin transaction: every deposit key signs
+    a permit for the BatchSweeper contract offline, which then pulls all the
+    balances to the admin. Deposit accounts never need ETH for gas.
+
+    Accounts go through the same checks as Sweeper.handle_new_tx and only
+    the selected tokens are pulled. A permit cannot move ETH, so an account
+    holding ETH worth returning is handed to `fallback`, the regular sweep.
+    Batches wait for their receipt, run them off the head loop. A pull that
+    fails on chain is skipped by the contract, its account is deferred and
+    evaluated again with the other deferred ones.
+    """
+
+    def __init__(
+        self,
+        sweeper: Sweeper,
+        contract_address: str = None,
+        fallback=None,
+        debug=DEBUG,
+    ):
+        self.sweeper = sweeper
+        self.fallback = fallback
+        self.admin = Account(constants.SIGNER, constants.SIGNER_PKEY)
+        if contract_address is None:
+            contract_address = utils.create_batch_sweeper(conn)
+            if debug:
+                print(f"[PermitSweeper] BatchSweeper deployed at {contract_address}")
+        self.contract_address = contract_address
+        self.contract = utils.contract_loader(
+            conn, contract_address, ERC20.batch_sweeper_abi
+        )
+        # token address -> name, part of the permit domain
+        self.token_names = {}
+        # (token address, owner) -> next permit nonce, read once from the token
+        self.permit_nonces = {}
+
+    def token_name(self, token) -> str:
+        if token.token_address not in self.token_names:
+            name = token.name or token.contract.functions.name().call()
+            self.token_names[token.token_address] = name
+        return self.token_names[token.token_address]
+
+    def next_permit_nonce(self, token, owner: str) -> int:
+        key = (token.token_address, owner)
+        if key not in self.permit_nonces:
+            self.permit_nonces[key] = token.contract.functions.nonces(owner).call()
+        nonce = self.permit_nonces[key]
+        self.permit_nonces[key] = nonce + 1
+        return nonce
+
+    def forget_permits(self, pulls: list):
+        """
+        Drop the local permit nonces of pulls whose permits were not used on
+        chain, they are read from the tokens again on the next signature, and
+        defer their accounts
+        """
+        for token_address, owner, *_ in pulls:
+            self.permit_nonces.pop((token_address, owner), None)
+            self.sweeper.deferrals.defer(owner)
+
+    def failed_pulls(self, receipt, pulls: list) -> list:
+        """
+        :return: the pulls the contract reported with PullFailed
+        """
+        events = self.contract.events.PullFailed().process_receipt(
+            receipt, errors=DISCARD
+        )
+        failed = {
+            (e["args"]["token"].lower(), e["args"]["owner"].lower()) for e in events
+        }
+        return [p for p in pulls if (p[0].lower(), p[1].lower()) in failed]
+
+    def record_pulls(self, receipt):
+        """
+        Record the balances the contract reported with Pulled as swept, the
+        admin paid the gas
+        """
+        ledger = self.sweeper.ledger
+        if ledger is None:
+            return
+        for e in self.contract.events.Pulled().process_receipt(receipt, errors=DISCARD):
+            ledger.record_sweep(
+                e["args"]["owner"],
+                e["args"]["token"],
+                e["args"]["value"],
+                receipt["blockNumber"],
+            )
+        ledger.flush()
+
+    def pulls(self, acc: Account, deadline: int, tokens=None) -> list:
+        """
+        :return: BatchSweeper.Pull tuples for every token the account holds
+        """
+        pulls = []
+        for t in self.sweeper.whitelist_token if tokens is None else tokens:
+            value = t.balance_of_wei(acc)
+            if value == 0:
+                continue
+            v, r, s = sign_permit(
+                self.token_name(t),
+                t.token_address,
+                builder.chain_id,
+                acc,
+                self.contract_address,
+                value,
+                self.next_permit_nonce(t, acc.address),
+                deadline,
+            )
+            pulls.append((t.token_address, acc.address, value, deadline, v, r, s))
+        return pulls
+
+    def sweep_accounts(self, accs: List[Account], debug=DEBUG):
+        """
+        :param accs: accounts to be swept
+        :return: hash of the single admin transaction, None if nothing was
+            pulled
+        """
+        deadline = int(time.time()) + config.PERMIT_DEADLINE
+        pulls = []
+        for acc in accs:
+            selected = self.sweeper.select_sweep(acc)
+            if selected is None:
+                continue
+            tokens, _, native = selected
+            if native and self.fallback is not None:
+                self.fallback(acc.address)
+                continue
+            pulls += self.pulls(acc, deadline, tokens)
+        if not pulls:
+            return None
+
+        data = bytes.fromhex(self.contract.encodeABI(fn_name="sweep", args=[pulls])[2:])
+        try:
+            # estimated before a nonce is taken, a failing call leaves none unused
+            gas = conn.eth.estimate_gas(
+                {
+                    "from": self.admin.address,
+                    "to": self.contract_address,
+                    "data": "0x" + data.hex(),
+                }
+            )
+            fees = builder.dynamic_fees()
+            tx = builder.build(
+                self.admin.address,
+                self.contract_address,
+                nonces.next(self.admin.address),
+                gas,
+                data,
+                **fees,
+            )
+            tx_hash = sign_and_send(tx, self.admin.private_key)
+        except Exception as e:
+            # none of the signed permits was used
+            self.forget_permits(pulls)
+            metrics.inc("permit_sweep.failed")
+            print(f"[PermitSweeper] batch of {len(pulls)} pulls not sent: {e}")
+            return None
+        if debug:
+            print(
+                f"[PermitSweeper] {len(pulls)} balances from {len(accs)} acc sent for pulling to admin (txHash: {tx_hash.hex()[:4] + '...' + tx_hash.hex()[-4:]})"
+            )
+
+        try:
+            receipt = conn.eth.wait_for_transaction_receipt(tx_hash)
+        except Exception as e:
+            print(f"[PermitSweeper] no receipt for {tx_hash.hex()}: {e}")
+            receipt = None
+        if receipt is None or receipt["status"] != 1:
+            # reverted permits leave the token nonces where they were
+            self.forget_permits(pulls)
+            metrics.inc("permit_sweep.reverted")
+            print(
+                f"[PermitSweeper] batch {tx_hash.hex()} not confirmed, status: {receipt and receipt['status']}"
+            )
+            return tx_hash
+        self.record_pulls(receipt)
+        failed = self.failed_pulls(receipt, pulls)
+        if failed:
+            # e.g. a spent permit nonce, an expired deadline or a moved balance
+            self.forget_permits(failed)
+            metrics.inc("permit_sweep.pulls_failed", len(failed))
+            print(f"[PermitSweeper] {len(failed)} of {len(pulls)} pulls failed")
+        return tx_hash
+
+    def handle_new_txs(self, addresses: List[str]):
+        accs = [self.sweeper.get_acc(a) for a in addresses]
+        try:
+            return self.sweep_accounts([a for a in accs if a is not None])
+        except Exception as e:
+            # the accounts are swept again on their next deposit
+            metrics.inc("permit_sweep.failed")
+            print(f"[PermitSweeper] sweep of {len(accs)} acc failed: {e}")
@@ -0,0 +1,163 @@
+from dataclasses import dataclass, field
+from typing import List
+from network import conn
+from account import Account
+from calldata import builder, encode_transfer
+from nonces import nonces, sign_and_send
+from tracing import tracer
+from costs import ETH_TRANSFER_GAS, cost_model
+import constants
+import config
+
+DEBUG = True
+
+
+@dataclass
+class SweepPlan:
+    account: str
+    gas_price: int
+    # (token or None for the ETH return, unsigned tx, amount) in nonce order,
+    # nonces are assigned by submit
+    txs: List[tuple] = field(default_factory=list)
+    # wei the admin sends first so the token transfers can pay their fees
+    funding: int = 0
+    # wei returned to the admin by the last tx
+    eth_return: int = 0
+    # block the funding was mined in, set by submit
+    funding_block: int = None
+
+    @property
+    def fees(self) -> int:
+        return sum(tx["gas"] for _, tx, _ in self.txs) * self.gas_price
+
+
+class SweepPlanner:
+    """
+    Builds a whole sweep up front: one transfer per token holding a balance
+    and the ETH return, with one legacy gas price, so every fee is known
+    before sending. Nonces are only taken when the plan is sent, a plan that
+    fails to build reserves none. All of them are broadcast back to back and
+    can land in the same block. An account lacking ETH is funded with the
+    fees of its txs at the gas price of one bump, so a stuck transfer can be
+    replaced, which has to be mined before its own txs are accepted. The ETH
+    return is sent as a drain, it returns the unused headroom and is
+    re-planned by the pending tx manager when an earlier transfer's fee is
+    bumped.
+    """
+
+    def __init__(
+        self,
+        provider=conn,
+        admin: Account = None,
+        costs=cost_model,
+        bump=config.FEE_BUMP,
+        cap=config.MAX_BUMP_GAS_PRICE,
+    ):
+        self.provider = provider
+        self.admin = admin or Account(constants.SIGNER, constants.SIGNER_PKEY)
+        self.costs = costs
+        self.bump = bump
+        self.cap = cap
+
+    def headroom_price(self, gas_price: int) -> int:
+        """
+        :return: gas price the funding pays for, the first replacement of
+            PendingTxManager up to its cap
+        """
+        return max(min(int(gas_price * self.bump) + 1, self.cap), gas_price)
+
+    def estimate_transfer(self, acc: Account, token, amount: int, debug=DEBUG) -> int:
+        """
+        :return: gas of the token transfer, from the learned transfer gas
+            with a margin when the node cannot estimate it
+        """
+        try:
+            # without fees, the account may not hold any ETH yet
+            return self.provider.eth.estimate_gas(
+                {
+                    "from": acc.address,
+                    "to": token.token_address,
+                    "data": "0x" + encode_transfer(self.admin.address, amount).hex(),
+                    "gasPrice": 0,
+                }
+            )
+        except Exception as e:
+            if debug:
+                print(f"[Planner] {token.symbol} gas not estimated: {e}")
+            return int(self.costs.transfer_gas(token.token_address) * 1.5)
+
+    def plan(self, acc: Account, tokens, gas_price: int) -> SweepPlan:
+        """
+        :param acc: account to be swept
+        :param tokens: tokens to be swept
+        :param gas_price: gas price of every tx of the sweep
+        :return: the sweep's transactions, not signed yet
+        """
+        with tracer.span("planner.plan", account=acc.address):
+            plan = SweepPlan(account=acc.address, gas_price=gas_price)
+            for t in tokens:
+                amount = t.balance_of_wei(acc)
+                if amount <= 0:
+                    continue
+                tx = builder.transfer(
+                    t.token_address,
+                    acc.address,
+                    self.admin.address,
+                    amount,
+                    nonce=None,
+                    gas=self.estimate_transfer(acc, t, amount),
+                    gasPrice=gas_price,
+                )
+                plan.txs.append((t, tx, amount))
+
+            balance = self.provider.eth.get_balance(acc.address)
+            token_fees = plan.fees
+            return_fee = ETH_TRANSFER_GAS * gas_price
+            gas = sum(tx["gas"] for _, tx, _ in plan.txs) + ETH_TRANSFER_GAS
+            needed = gas * self.headroom_price(gas_price)
+            if plan.txs and balance < needed:
+                plan.funding = needed - balance
+            if balance + plan.funding - token_fees > return_fee:
+                plan.eth_return = balance + plan.funding - token_fees - return_fee
+                tx = builder.send_eth(
+                    acc.address,
+                    self.admin.address,
+                    plan.eth_return,
+                    nonce=None,
+                    gas=ETH_TRANSFER_GAS,
+                    gasPrice=gas_price,
+                )
+                plan.txs.append((None, tx, plan.eth_return))
+            return plan
+
+    def submit(self, plan: SweepPlan, acc: Account, debug=DEBUG) -> List[tuple]:
+        """
+        :return: [(token or None, tx hash, amount)] of the account's transactions
+        """
+        with tracer.span("planner.submit", account=acc.address, txs=len(plan.txs)):
+            if plan.funding > 0:
+                tx = builder.send_eth(
+                    self.admin.address,
+                    acc.address,
+                    plan.funding,
+                    nonce=nonces.next(self.admin.address),
+                    gas=ETH_TRANSFER_GAS,
+                    gasPrice=plan.gas_price,
+                )
+                tx_hash = sign_and_send(tx, self.admin.private_key)
+                with tracer.span("planner.wait_funding", account=acc.address):
+                    receipt = self.provider.eth.wait_for_transaction_receipt(
+                        tx_hash, poll_latency=0.1
+                    )
+                plan.funding_block = receipt["blockNumber"]
+
+            sent = []
+            for t, tx, amount in plan.txs:
+                tx["nonce"] = nonces.next(acc.address)
+                tx_hash = sign_and_send(tx, acc.private_key, drain=t is None)
+                sent.append((t, tx_hash, amount))
+            if debug:
+                print(
+                    f"[Planner] {acc.shorten_address}: {len(sent)} tx sent, funding: {plan.funding/10**18} ETH, return: {plan.eth_return/10**18} ETH, fees: {plan.fees/10**18} ETH"
+                )
+            return sent
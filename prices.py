@@ -0,0 +1,129 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from threading import Event, Lock, Thread
+from typing import Dict, Iterable
+from metrics import metrics
+import config
+
+DEBUG = True
+
+
+class PriceSource(ABC):
+    """
+    Base class of USD price sources, fetch() is called in bulk from the
+    background refresher of PriceCache
+    """
+
+    @abstractmethod
+    def fetch(self, symbols: Iterable[str]) -> Dict[str, float]:
+        """
+        :return: {symbol: usd price}, symbols the source has no price for left out
+        """
+
+
+class StaticPriceSource(PriceSource):
+    def __init__(self, prices: Dict[str, float]):
+        self.prices = prices
+
+    def fetch(self, symbols):
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+
+class FilePriceSource(PriceSource):
+    """
+    Reads {symbol: usd price} from a json file on every fetch, so prices can be
+    edited while the sweeper runs
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self, symbols):
+        with open(self.path) as f:
+            prices = json.load(f)
+        return {s: float(prices[s]) for s in symbols if s in prices}
+
+
+class PriceCache:
+    """
+    Per-symbol price cache. Entries expire after `ttl` seconds or `max_blocks`
+    blocks, expired entries keep being served while a background thread
+    refreshes every known symbol in one fetch.
+    """
+
+    def __init__(
+        self,
+        source: PriceSource,
+        ttl=config.PRICE_TTL,
+        max_blocks=config.PRICE_MAX_BLOCKS,
+    ):
+        self.source = source
+        self.ttl = ttl
+        self.max_blocks = max_blocks
+        # symbol -> (usd price, fetched at, block at fetch)
+        self.entries = {}
+        self.block_number = 0
+        self._lock = Lock()
+        self._stale = Event()
+        self._thread = None
+
+    def price(self, symbol: str) -> float:
+        """
+        :param symbol: token symbol, "ETH" for ether
+        :return: usd price, fetched synchronously only the first time
+        :raise ValueError: the source has no price for the symbol, a token
+            priced at $0 would be deferred by the cost model for good
+        """
+        entry = self.entries.get(symbol)
+        if entry is None:
+            self.refresh([symbol])
+            entry = self.entries.get(symbol)
+            if entry is None:
+                metrics.inc("prices.missing")
+                raise ValueError(f"no usd price for {symbol}")
+        if self.expired(entry):
+            self._stale.set()
+        return entry[0]
+
+    def expired(self, entry) -> bool:
+        _, fetched_at, block_number = entry
+        if time.time() - fetched_at > self.ttl:
+            return True
+        return self.block_number - block_number >= self.max_blocks
+
+    def on_block(self, block_number: int):
+        self.block_number = block_number
+        if any(self.expired(e) for e in self.entries.values()):
+            self._stale.set()
+
+    def refresh(self, symbols: Iterable[str] = None, debug=DEBUG):
+        with self._lock:
+            symbols = list(symbols or self.entries)
+            prices = self.source.fetch(symbols)
+            now = time.time()
+            for symbol, usd in prices.items():
+                self.entries[symbol] = (usd, now, self.block_number)
+        metrics.inc("prices.refreshes")
+        if debug:
+            print(f"[Prices] refreshed {len(prices)} prices")
+
+    def start(self):
+        """
+        Start the background refresher
+        """
+        if self._thread is None:
+            self._thread = Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._stale.wait(timeout=self.ttl)
+            self._stale.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[Prices] refresh failed: {e}")
+
+
+price_cache = PriceCache(FilePriceSource(config.PRICE_FILE))
@@ -0,0 +1,157 @@
+import json
+import os
+from threading import Lock
+from typing import Iterator
+from web3 import Web3
+from prices import price_cache
+import config
+
+DEBUG = True
+
+
+class TokenRegistry:
+    """
+    Whitelisted tokens keyed by lowercased address, in the order they were
+    added. `address in registry` is O(1) and takes any casing, so the block
+    decoder filters tx.to against it directly.
+
+    Tokens listed in `path` (json: [{"address": ..., "symbol": ..., "decimals":
+    ...}], symbol and decimals optional) are attached to their deployed
+    contracts, and the file is re-read on a head once it changed on disk.
+    Metadata read from a contract is cached for the life of the process.
+    A token without a usd price in `prices` is refused.
+    """
+
+    def __init__(self, path=config.TOKEN_FILE, prices=price_cache):
+        self.path = path
+        self.prices = prices
+        self._lock = Lock()
+        self._tokens = {}
+        # address -> (symbol, decimals) read from the contract
+        self.metadata = {}
+        # addresses listed in the file on its last load
+        self.from_file = set()
+        self._mtime = None
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def __contains__(self, address: str) -> bool:
+        return address.lower() in self._tokens
+
+    def __iter__(self) -> Iterator:
+        # a copy, a reload may run while a sweep iterates
+        with self._lock:
+            return iter(list(self._tokens.values()))
+
+    def get(self, address: str):
+        return self._tokens.get(address.lower())
+
+    def add(self, token) -> bool:
+        """
+        :return: False if a token with that address was already registered
+        :raise ValueError: the token has no usd price
+        """
+        self.prices.price(token.symbol)
+        key = token.token_address.lower()
+        with self._lock:
+            if key in self._tokens:
+                return False
+            self._tokens[key] = token
+            return True
+
+    def remove(self, address: str):
+        """
+        :return: the removed token, None if it was not registered
+        """
+        with self._lock:
+            return self._tokens.pop(address.lower(), None)
+
+    def fetch_metadata(self, address: str) -> tuple:
+        """
+        :return: (symbol, decimals) of a deployed token, read once
+        """
+        key = address.lower()
+        if key not in self.metadata:
+            from classes import Token
+
+            contract = Token.at(Web3.to_checksum_address(address), symbol=None).contract
+            self.metadata[key] = (
+                contract.functions.symbol().call(),
+                contract.functions.decimals().call(),
+            )
+        return self.metadata[key]
+
+    def attach(self, address: str, symbol: str = None, decimals: int = None):
+        """
+        :param address: deployed token contract
+        :param symbol: read from the contract when None
+        :param decimals: read from the contract when None
+        :return: Token attached to the contract, nothing is deployed
+        """
+        from classes import Token
+
+        if symbol is None or decimals is None:
+            fetched_symbol, fetched_decimals = self.fetch_metadata(address)
+            symbol = fetched_symbol if symbol is None else symbol
+            decimals = fetched_decimals if decimals is None else decimals
+        return Token.at(Web3.to_checksum_address(address), symbol, decimals)
+
+    def load(self, debug=DEBUG):
+        """
+        Sync the registry with the file: attach newly listed tokens and drop
+        the ones no longer listed. Tokens added in code are left alone. Every
+        new token is attached before the registry changes, a file that fails
+        leaves it as it was.
+        """
+        mtime = os.path.getmtime(self.path)
+        with open(self.path) as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise ValueError(f"expected a json list, got {type(entries).__name__}")
+
+        listed = {}
+        for e in entries:
+            listed[e["address"].lower()] = e
+        attached = {
+            key: self.attach(e["address"], e.get("symbol"), e.get("decimals"))
+            for key, e in listed.items()
+            if key not in self
+        }
+        for token in attached.values():
+            self.prices.price(token.symbol)
+
+        with self._lock:
+            unlisted = [
+                self._tokens.pop(key)
+                for key in self.from_file - listed.keys()
+                if key in self._tokens
+            ]
+            for key, token in attached.items():
+                self._tokens.setdefault(key, token)
+            self.from_file = set(listed)
+            self._mtime = mtime
+        if debug:
+            for token in unlisted:
+                print(f"[Registry] {token.symbol}({token.token_address}) unlisted")
+            for token in attached.values():
+                print(f"[Registry] {token.symbol}({token.token_address}) listed")
+
+    def on_block(self, block_number: int, debug=DEBUG):
+        """
+        Hot reload: re-read the file when it changed since the last load
+        """
+        if self.path is None:
+            return
+        try:
+            mtime = os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            self.load(debug)
+        except Exception as e:
+            # keep the current whitelist until the file is fixed
+            self._mtime = mtime
+            print(f"[Registry] {self.path} not reloaded: {e}")
@@ -0,0 +1,240 @@
+import itertools
+import json
+import statistics
+import sys
+from dataclasses import dataclass, asdict
+from multiprocessing import Pool
+from typing import List
+from coalescer import DepositCoalescer
+from costs import CostModel, DeferredSweeps, ETH_TRANSFER_GAS, DEFER
+import decoder
+import config
+
+DEBUG = True
+
+# gas of a sweep besides the token transfers: admin top-up + eth return
+SWEEP_OVERHEAD_GAS = 2 * 21_000
+
+
+class Recorder:
+    """
+    Appends what the sweeper sees per block to a jsonl file:
+    {"block": n, "gas_price": wei, "eth_usd": usd,
+     "deposits": [[account, symbol, usd], ...]}
+    """
+
+    def __init__(self, path: str, sweeper):
+        self.file = open(path, "a")
+        self.sweeper = sweeper
+
+    def record(self, block, events: List[decoder.DepositEvent]):
+        tokens = self.sweeper.whitelist_token
+        prices = self.sweeper.prices
+        deposits = []
+        for e in events:
+            for d in e.deposits:
+                if d.token == decoder.NATIVE:
+                    symbol, decimals = "ETH", 18
+                else:
+                    t = tokens.get(d.token)
+                    symbol, decimals = t.symbol, t.decimals
+                usd = d.amount / 10**decimals * prices.price(symbol)
+                deposits.append([e.account, symbol, usd])
+
+        # same estimate as Sweeper.est_gas_price, from the first 10 tx
+        gas_prices = [tx["gasPrice"] for tx in block["transactions"][:10]]
+        if gas_prices:
+            gas_price = statistics.median(gas_prices)
+        else:
+            # empty block, est_gas_price falls back to eth_gasPrice
+            from network import conn
+
+            gas_price = conn.eth.gas_price
+        line = {
+            "block": block["number"],
+            "gas_price": gas_price,
+            "eth_usd": prices.price("ETH"),
+            "deposits": deposits,
+        }
+        self.file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self.file.flush()
+
+
+@dataclass(frozen=True)
+class Policy:
+    min_usd: float = config.MINIMUM_AMOUNT_USD
+    max_gas_price: int = config.MAX_GAS_PRICE
+    window: int = config.COALESCE_WINDOW
+    cost_ratio: float = config.SWEEP_COST_RATIO
+
+
+@dataclass
+class Report:
+    policy: Policy
+    blocks: int = 0
+    sweeps: int = 0
+    skipped_gas: int = 0
+    skipped_min: int = 0
+    skipped_cost: int = 0
+    forced_sweeps: int = 0
+    gas_spent_wei: int = 0
+    swept_usd: float = 0.0
+    mean_unswept_usd: float = 0.0
+    max_unswept_usd: float = 0.0
+    final_unswept_usd: float = 0.0
+    max_block_violations: int = 0
+
+
+def load(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def backtest(
+    stream: list, policy: Policy, gas_per_transfer=config.DEFAULT_TRANSFER_GAS
+) -> Report:
+    """
+    Run a recorded stream through the sweep decisions of main.py and
+    Sweeper.handle_new_tx: coalescing window, gas price cap, minimum usd and
+    the cost model. An account left with a balance is evaluated again every
+    DEFER_RECHECK_BLOCKS and swept whatever the cost once overdue, as live.
+    """
+    report = Report(policy=policy)
+    costs = CostModel(default_gas=gas_per_transfer, ratio=policy.cost_ratio)
+    deferrals = DeferredSweeps(max_block=config.MAX_BLOCK - policy.window)
+    coalescer = DepositCoalescer(window=policy.window, publish=False)
+    # account -> {symbol: usd}
+    pending = {}
+    # account -> block of its oldest unswept deposit, oldest first, only
+    # accounts not yet counted as MAX_BLOCK violations
+    oldest = {}
+    unswept = 0.0
+    unswept_sum = 0.0
+
+    for line in stream:
+        block, gas_price = line["block"], line["gas_price"]
+        # recordings without it cost no usd, every balance is swept
+        eth_usd = line.get("eth_usd", 0.0)
+        counts = {}
+        for account, symbol, usd in line["deposits"]:
+            if account not in pending:
+                pending[account] = {}
+                oldest[account] = block
+            balances = pending[account]
+            balances[symbol] = balances.get(symbol, 0.0) + usd
+            counts[account] = counts.get(account, 0) + 1
+            unswept += usd
+        for account, cnt in counts.items():
+            coalescer.add(account, block, cnt)
+
+        due = coalescer.due(block, debug=False)
+        due += [a for a in deferrals.on_block(block) if a not in set(due)]
+        for account in due:
+            balances = pending.get(account, {})
+            total = sum(balances.values())
+            if not balances:
+                deferrals.clear(account)
+                continue
+            if deferrals.overdue(account):
+                report.forced_sweeps += 1
+                selected = list(balances)
+            elif gas_price > policy.max_gas_price:
+                report.skipped_gas += 1
+                deferrals.defer(account)
+                continue
+            elif total < policy.min_usd:
+                report.skipped_min += 1
+                deferrals.defer(account)
+                continue
+            else:
+                # tokens first and the ETH last, as in CostModel.select
+                symbols = [s for s in balances if s != "ETH"] + ["ETH"]
+                gas = [gas_per_transfer] * (len(symbols) - 1) + [ETH_TRANSFER_GAS]
+                decisions = costs.decide_all(
+                    [balances.get(s, 0.0) for s in symbols],
+                    [g * gas_price / 10**18 * eth_usd for g in gas],
+                )
+                selected = [s for s, d in zip(symbols, decisions) if d != DEFER]
+            if len(selected) < len(balances):
+                deferrals.defer(account)
+            else:
+                deferrals.clear(account)
+            if not selected:
+                report.skipped_cost += 1
+                continue
+            tokens = sum(1 for s in selected if s != "ETH")
+            report.sweeps += 1
+            report.gas_spent_wei += int(
+                (tokens * gas_per_transfer + SWEEP_OVERHEAD_GAS) * gas_price
+            )
+            for s in selected:
+                usd = balances.pop(s, 0.0)
+                report.swept_usd += usd
+                unswept -= usd
+            if not balances:
+                del pending[account]
+                oldest.pop(account, None)
+
+        while oldest:
+            account, since = next(iter(oldest.items()))
+            if block - since <= config.MAX_BLOCK:
+                break
+            del oldest[account]
+            report.max_block_violations += 1
+
+        report.blocks += 1
+        unswept_sum += unswept
+        report.max_unswept_usd = max(report.max_unswept_usd, unswept)
+
+    report.final_unswept_usd = unswept
+    report.mean_unswept_usd = unswept_sum / report.blocks if report.blocks else 0.0
+    return report
+
+
+_stream = None
+
+
+def _init_worker(path: str):
+    global _stream
+    _stream = load(path)
+
+
+def _run(policy: Policy) -> Report:
+    return backtest(_stream, policy)
+
+
+def sweep_policies(path: str, policies: List[Policy], processes=None) -> List[Report]:
+    """
+    :param path: recorded jsonl stream
+    :param policies: parameter sets to be compared
+    :param processes: worker processes, all cores by default
+    :return: one report per policy, in order
+    """
+    with Pool(processes, initializer=_init_worker, initargs=(path,)) as pool:
+        return pool.map(_run, policies)
+
+
+def grid(min_usd=(), max_gas_price=(), window=(), cost_ratio=()) -> List[Policy]:
+    defaults = Policy()
+    return [
+        Policy(*p)
+        for p in itertools.product(
+            min_usd or [defaults.min_usd],
+            max_gas_price or [defaults.max_gas_price],
+            window or [defaults.window],
+            cost_ratio or [defaults.cost_ratio],
+        )
+    ]
+
+
+if __name__ == "__main__":
+    reports = sweep_policies(
+        sys.argv[1],
+        grid(
+            min_usd=[10, 50, 100, 500],
+            max_gas_price=[10**10, 3 * 10**10, 10**11],
+            window=[1, 5, 20, 100],
+        ),
+    )
+    for r in sorted(reports, key=lambda r: (r.max_block_violations, r.gas_spent_wei)):
+        print(json.dumps(asdict(r)))
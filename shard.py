@@ -0,0 +1,302 @@
+import bisect
+import hashlib
+import multiprocessing
+import os
+from threading import RLock
+from typing import List
+from classes import Token, Sweeper
+from account import Account
+from keystore import Keystore
+from ledger import DepositLedger, LedgerOutbox
+from nonces import nonces
+from pending import pending_txs
+from prices import price_cache
+from allowances import allowances
+from limiter import rpc_limiter
+from calldata import builder
+from metrics import metrics
+from tracing import tracer
+import constants
+import network
+import config
+
+DEBUG = True
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring of worker ids, adding or removing a worker only moves
+    the addresses of its neighbouring arcs
+    """
+
+    def __init__(self, vnodes=config.SHARD_VNODES):
+        self.vnodes = vnodes
+        self._keys = []
+        self._nodes = {}
+
+    def add(self, node: int):
+        for i in range(self.vnodes):
+            h = ring_hash(f"{node}:{i}")
+            bisect.insort(self._keys, h)
+            self._nodes[h] = node
+
+    def remove(self, node: int):
+        for i in range(self.vnodes):
+            h = ring_hash(f"{node}:{i}")
+            self._keys.remove(h)
+            del self._nodes[h]
+
+    def lookup(self, address: str) -> int:
+        """
+        :param address: deposit address
+        :return: id of the worker owning the address
+        """
+        idx = bisect.bisect(self._keys, ring_hash(address.lower())) % len(self._keys)
+        return self._nodes[self._keys[idx]]
+
+
+def reset_after_fork():
+    """
+    A forked worker copies the process-wide state of its parent, locks held by
+    the parent's other threads and their in-flight counts included, so it
+    starts that state over
+    """
+    # held by a parent thread inside sign_and_send it would never be released
+    network.send_lock = RLock()
+    # first, the others report to it
+    metrics.__init__()
+    rpc_limiter.__init__()
+    tracer.__init__()
+    nonces.__init__()
+    pending_txs.__init__()
+    allowances.__init__()
+    price_cache.__init__(price_cache.source)
+
+
+def worker_loop(
+    worker_id: int,
+    inbox,
+    tokens: List[dict],
+    admin_nonce,
+    keystore_path: str = None,
+    ledger_outbox=None,
+    debug=DEBUG,
+):
+    """
+    Entry point of a worker process. Owns its accounts, its own HTTP session
+    and nonces, the admin nonce is shared with the other processes. Accounts
+    of the keystore are assigned by address, their keys are read from the
+    worker's own mapping of the file. Settled sweeps are sent to the ledger
+    of the ingesting process through `ledger_outbox`.
+    """
+    reset_after_fork()
+    network.reconnect()
+    nonces.share(constants.SIGNER, admin_nonce)
+    price_cache.start()
+    sweeper = Sweeper()
+    for t in tokens:
+        sweeper.add_token(Token.at(**t), debug=False)
+    if keystore_path is not None:
+        sweeper.keystore = Keystore(keystore_path, os.environ.get("KEYSTORE_PASSWORD"))
+    if ledger_outbox is not None:
+        sweeper.ledger = LedgerOutbox(ledger_outbox)
+    # lowercased keystore addresses of the shard
+    owned = set()
+
+    while True:
+        kind, payload = inbox.get()
+        if kind == "assign":
+            for acc in payload:
+                if isinstance(acc, str):
+                    owned.add(acc.lower())
+                else:
+                    sweeper.add_acc(acc, debug=False)
+        elif kind == "release":
+            released = {a.lower() for a in payload}
+            owned -= released
+            sweeper.acc_list = [
+                a for a in sweeper.acc_list if a.address.lower() not in released
+            ]
+        elif kind == "block":
+            # per-head hooks of the transactions this worker sent
+            try:
+                price_cache.on_block(payload)
+                builder.on_block(payload)
+                allowances.on_block(payload)
+                pending_txs.on_block(payload)
+                sweeper.process_receipts()
+                due = sweeper.deferrals.on_block(payload)
+            except Exception as e:
+                print(f"[Worker {worker_id}] head {payload} not processed: {e}")
+                due = []
+            for address in due:
+                try:
+                    sweeper.handle_new_tx(address)
+                except Exception as e:
+                    print(f"[Worker {worker_id}] sweep of {address} failed: {e}")
+        elif kind == "sweep":
+            try:
+                sweeper.handle_new_tx(payload)
+            except Exception as e:
+                # the account is swept again on its next deposit
+                print(f"[Worker {worker_id}] sweep of {payload} failed: {e}")
+        elif kind == "stop":
+            break
+
+        if debug and kind in ("assign", "release"):
+            print(
+                f"[Worker {worker_id}] {kind} {len(payload)} acc, owns: {len(sweeper.acc_list) + len(owned)}"
+            )
+
+
+class ShardPool:
+    """
+    Runs `workers` sweeper processes, each owning a consistent-hash shard of
+    the deposit addresses. The ingesting process only dispatches deposits.
+    A worker found dead on dispatch is restarted with the same shard. Every
+    head is forwarded to the workers, which bump and settle their own txs.
+
+    Accounts of a keystore are added by address and no private key is sent,
+    the workers open `keystore_path` themselves. The sweeps they settle are
+    recorded in `ledger` on the next head.
+
+    Workers are forked, create the pool before starting any thread.
+    """
+
+    def __init__(
+        self,
+        tokens: List[Token],
+        workers=config.WORKERS,
+        keystore_path: str = config.KEYSTORE_FILE,
+        ledger: DepositLedger = None,
+    ):
+        if config.BACKEND == "eth_tester":
+            raise ValueError("Sharded workers need a node shared by all processes")
+        # fork so workers do not re-run the importing script
+        self.ctx = multiprocessing.get_context("fork")
+        self.tokens = [
+            {
+                "token_address": t.token_address,
+                "symbol": t.symbol,
+                "decimals": t.decimals,
+            }
+            for t in tokens
+        ]
+        self.keystore_path = keystore_path
+        self.ledger = ledger
+        self.ledger_outbox = self.ctx.Queue() if ledger is not None else None
+        self.admin_nonce = self.ctx.Value("q", -1)
+        nonces.share(constants.SIGNER, self.admin_nonce)
+        self.ring = HashRing()
+        self.workers = {}
+        self.accounts = {}
+        self.owner = {}
+        self._next_id = 0
+        for _ in range(workers):
+            self.add_worker()
+
+    def start_worker(self, worker_id: int):
+        inbox = self.ctx.Queue()
+        process = self.ctx.Process(
+            target=worker_loop,
+            args=(
+                worker_id,
+                inbox,
+                self.tokens,
+                self.admin_nonce,
+                self.keystore_path,
+                self.ledger_outbox,
+            ),
+            daemon=True,
+        )
+        process.start()
+        self.workers[worker_id] = (process, inbox)
+
+    def add_worker(self) -> int:
+        worker_id = self._next_id
+        self._next_id += 1
+        self.start_worker(worker_id)
+        self.ring.add(worker_id)
+        self.rebalance()
+        return worker_id
+
+    def restart_worker(self, worker_id: int, debug=DEBUG):
+        """
+        Replace a dead worker, its shard is assigned to the new process.
+        Sweeps queued to the dead one are lost until the next deposit.
+        """
+        process, _ = self.workers[worker_id]
+        self.start_worker(worker_id)
+        owned = [self.accounts[k] for k, w in self.owner.items() if w == worker_id]
+        if owned:
+            self.workers[worker_id][1].put(("assign", owned))
+        metrics.inc("shard.restarts")
+        if debug:
+            print(
+                f"[ShardPool] worker {worker_id} died (exit code {process.exitcode}), restarted with {len(owned)} acc"
+            )
+
+    def remove_worker(self, worker_id: int):
+        self.ring.remove(worker_id)
+        process, inbox = self.workers.pop(worker_id)
+        self.rebalance()
+        inbox.put(("stop", None))
+        process.join()
+
+    def add_account(self, acc: Account | str):
+        """
+        :param acc: account held in memory, or address of a keystore account
+        """
+        key = getattr(acc, "address", acc).lower()
+        self.accounts[key] = acc
+        self.owner[key] = self.ring.lookup(key)
+        self.workers[self.owner[key]][1].put(("assign", [acc]))
+
+    def rebalance(self):
+        """
+        Move every account whose owner changed on the ring to its new worker
+        """
+        moves = {}
+        for key, acc in self.accounts.items():
+            new_owner = self.ring.lookup(key)
+            old_owner = self.owner.get(key)
+            if new_owner != old_owner:
+                moves.setdefault((old_owner, new_owner), []).append(acc)
+                self.owner[key] = new_owner
+
+        for (old_owner, new_owner), accs in moves.items():
+            if old_owner in self.workers:
+                addresses = [getattr(a, "address", a) for a in accs]
+                self.workers[old_owner][1].put(("release", addresses))
+            self.workers[new_owner][1].put(("assign", accs))
+
+    def dispatch(self, address: str):
+        """
+        :param address: deposit address to be swept by its owning worker
+        """
+        owner = self.owner.get(address.lower())
+        if owner is None:
+            return
+        if not self.workers[owner][0].is_alive():
+            self.restart_worker(owner)
+        self.workers[owner][1].put(("sweep", address))
+
+    def on_block(self, block_number: int):
+        """
+        :param block_number: new head, forwarded to every live worker
+        """
+        if self.ledger is not None:
+            LedgerOutbox.apply(self.ledger_outbox, self.ledger)
+        for process, inbox in self.workers.values():
+            if process.is_alive():
+                inbox.put(("block", block_number))
+
+    def stop(self):
+        for worker_id in list(self.workers):
+            process, inbox = self.workers.pop(worker_id)
+            inbox.put(("stop", None))
+            process.join()
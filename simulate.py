@@ -0,0 +1,172 @@
+from dataclasses import dataclass, field
+from typing import List
+from classes import Sweeper, Eth
+from account import Account
+import network
+from network import conn
+from nonces import nonces
+from pending import pending_txs
+import constants
+
+DEBUG = True
+
+
+@dataclass
+class StepResult:
+    tx_hash: str
+    sender: str
+    to: str
+    gas_used: int
+    fee: int
+    status: int
+
+
+@dataclass
+class SimulationResult:
+    account: str
+    steps: List[StepResult] = field(default_factory=list)
+    # balances of the account after the sweep, same rows as get_balances_breakdown
+    final_balances: list = None
+    # admin's usd gain: tokens received + eth returned - gas funding - fees
+    net_value_usd: float = 0.0
+    # set when a step could not even be sent, e.g. gas estimation reverted
+    error: str = None
+
+    @property
+    def gas_used(self) -> int:
+        return sum(i.gas_used for i in self.steps)
+
+    @property
+    def ok(self) -> bool:
+        if self.error is not None:
+            return False
+        return all(i.status == 1 for i in self.steps) and self.net_value_usd > 0
+
+
+def rpc(method: str, params=None):
+    response = conn.provider.make_request(method, params or [])
+    if "error" in response:
+        raise RuntimeError(f"{method} failed: {response['error']}")
+    return response["result"]
+
+
+def mine():
+    rpc("evm_mine")
+
+
+class SweepSimulator:
+    """
+    Dry-runs Sweeper.sweep on an anvil node: takes an evm_snapshot, sends the
+    real transaction sequence, mines it, reads receipts and balances, then
+    reverts. The simulation holds network.send_lock throughout, so every
+    other broadcast of this process waits until the revert instead of being
+    rolled back with it.
+    """
+
+    def __init__(self, sweeper: Sweeper):
+        self.sweeper = sweeper
+        self.admin = Account(constants.SIGNER, constants.SIGNER_PKEY)
+
+    def admin_value_usd(self) -> float:
+        prices = self.sweeper.prices
+        value = Eth().check_balance(self.admin) / 10**18 * prices.price("ETH")
+        for t in self.sweeper.whitelist_token:
+            value += t.balance_of(self.admin) * prices.price(t.symbol)
+        return value
+
+    def dry_run(
+        self, acc: Account, tokens, gas_price: int, debug=DEBUG
+    ) -> SimulationResult:
+        """
+        :param acc: account to be swept
+        :param tokens: tokens to be swept, see Sweeper.select_sweep
+        :param gas_price: gas price of the sweep
+        :return: per-step gas, final balances and net value of the sweep
+        """
+        result = SimulationResult(account=acc.address)
+        with network.send_lock:
+            tracked = pending_txs.hashes()
+            snapshot = rpc("evm_snapshot")
+            try:
+                start_block = conn.eth.block_number
+                value_before = self.admin_value_usd()
+                try:
+                    # the reverted receipts must not reach the ledger
+                    self.sweeper.sweep(
+                        acc,
+                        settle=mine,
+                        tokens=tokens,
+                        gas_price=gas_price,
+                        record=False,
+                    )
+                except Exception as e:
+                    result.error = str(e)
+                mine()
+                result.steps = self.collect_steps(start_block, acc)
+                result.final_balances = self.sweeper.get_balances_breakdown(acc)
+                result.net_value_usd = self.admin_value_usd() - value_before
+            finally:
+                rpc("evm_revert", [snapshot])
+                # the reverted transactions consumed local nonces
+                nonces.reset(acc.address)
+                nonces.reset(self.admin.address)
+                pending_txs.forget(pending_txs.hashes() - tracked)
+
+        if debug:
+            print(
+                f"[Simulator] {acc.shorten_address}: {len(result.steps)} tx, gas used: {result.gas_used}, net: ${result.net_value_usd:.2f}, ok: {result.ok}"
+            )
+        return result
+
+    def dry_run_many(self, accs: List[Account]) -> List[SimulationResult]:
+        """
+        :return: results of the accounts handle_new_tx would sweep now
+        """
+        results = []
+        for acc in accs:
+            selected = self.sweeper.select_sweep(acc)
+            if selected is not None:
+                tokens, gas_price, _ = selected
+                results.append(self.dry_run(acc, tokens, gas_price))
+        return results
+
+    def handle_new_tx(self, address: str, debug=DEBUG):
+        """
+        Sweep the account only if its dry-run succeeds with a positive net
+        value, the sweep sent is the one simulated
+        """
+        acc = self.sweeper.get_acc(address)
+        if acc is None:
+            print(f"[Simulator] Account not found: {address}")
+            return
+        selected = self.sweeper.select_sweep(acc)
+        if selected is None:
+            return
+        tokens, gas_price, _ = selected
+        result = self.dry_run(acc, tokens, gas_price)
+        if not result.ok:
+            if debug:
+                print(f"[Simulator] Sweep of {acc.shorten_address} rejected")
+            return result
+        self.sweeper.sweep(acc, tokens=tokens, gas_price=gas_price)
+        return result
+
+    def collect_steps(self, start_block: int, acc: Account) -> List[StepResult]:
+        senders = {acc.address.lower(), self.admin.address.lower()}
+        steps = []
+        for n in range(start_block + 1, conn.eth.block_number + 1):
+            for tx in conn.eth.get_block(n, full_transactions=True)["transactions"]:
+                if tx["from"].lower() not in senders:
+                    continue
+                receipt = conn.eth.get_transaction_receipt(tx["hash"])
+                steps.append(
+                    StepResult(
+                        tx_hash=tx["hash"].hex(),
+                        sender=tx["from"],
+                        to=tx["to"],
+                        gas_used=receipt["gasUsed"],
+                        fee=receipt["gasUsed"] * receipt["effectiveGasPrice"],
+                        status=receipt["status"],
+                    )
+                )
+        return steps
@@ -0,0 +1,175 @@
+from typing import Dict, List
+import numpy as np
+import limiter
+from classes import Sweeper, User, Eth
+
+DEBUG = True
+
+# wei is stored exactly as 4 little-endian 32-bit limbs (128 bits), limb sums
+# over up to 2**32 accounts cannot overflow uint64
+LIMBS = 4
+LIMB_BITS = 32
+LIMB_SCALE = np.array([2.0 ** (LIMB_BITS * i) for i in range(LIMBS)])
+
+
+def to_limbs(wei: int) -> List[int]:
+    """
+    :raise ValueError: wei is negative or does not fit in 128 bits
+    """
+    if not 0 <= wei < 1 << (LIMB_BITS * LIMBS):
+        raise ValueError(f"balance does not fit in {LIMB_BITS * LIMBS} bits: {wei}")
+    return [(wei >> (LIMB_BITS * i)) & 0xFFFFFFFF for i in range(LIMBS)]
+
+
+class BalanceSnapshot:
+    """
+    accounts x (ETH + tokens) balance matrix captured once, every report is
+    vectorized numpy over the arrays and makes no RPC
+    """
+
+    def __init__(
+        self,
+        addresses: np.ndarray,
+        user_ids: np.ndarray,
+        users: List[str],
+        symbols: List[str],
+        decimals: np.ndarray,
+        limbs: np.ndarray,
+    ):
+        self.addresses = addresses
+        self.user_ids = user_ids
+        self.users = users
+        self.symbols = symbols
+        self.decimals = decimals
+        # shape (accounts, columns, LIMBS), uint32
+        self.limbs = limbs
+        self._amounts = None
+
+    @classmethod
+    def capture(
+        cls, sweeper: Sweeper, users: List[User] = (), debug=DEBUG
+    ) -> "BalanceSnapshot":
+        """
+        :param sweeper: sweeper holding the accounts and whitelisted tokens
+        :param users: owners of the accounts, unowned accounts get user id -1
+        :return: snapshot of the current on-chain balances
+        """
+        owner = {}
+        for uid, user in enumerate(users):
+            for acc in user.wallets:
+                owner[acc.address.lower()] = uid
+
+        eth = Eth()
+        tokens = sweeper.whitelist_token
+        accounts = list(sweeper.accounts())
+        rows = []
+        with limiter.priority(limiter.BULK):
+            for acc in accounts:
+                row = [eth.check_balance(acc)] + [t.balance_of_wei(acc) for t in tokens]
+                rows.append([to_limbs(wei) for wei in row])
+
+        snapshot = cls(
+            addresses=np.array([acc.address for acc in accounts]),
+            user_ids=np.array(
+                [owner.get(acc.address.lower(), -1) for acc in accounts],
+                dtype=np.int64,
+            ),
+            users=[u.uid for u in users],
+            symbols=["ETH"] + [t.symbol for t in tokens],
+            decimals=np.array([18] + [t.decimals for t in tokens], dtype=np.int64),
+            limbs=np.array(rows, dtype=np.uint32).reshape(
+                len(rows), len(tokens) + 1, LIMBS
+            ),
+        )
+        if debug:
+            print(
+                f"[Snapshot] captured {len(rows)} acc x {len(snapshot.symbols)} balances"
+            )
+        return snapshot
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            addresses=self.addresses,
+            user_ids=self.user_ids,
+            users=np.array(self.users, dtype=str),
+            symbols=np.array(self.symbols),
+            decimals=self.decimals,
+            limbs=self.limbs,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BalanceSnapshot":
+        with np.load(path) as f:
+            return cls(
+                addresses=f["addresses"],
+                user_ids=f["user_ids"],
+                users=[str(u) for u in f["users"]],
+                symbols=[str(s) for s in f["symbols"]],
+                decimals=f["decimals"],
+                limbs=f["limbs"],
+            )
+
+    def amounts(self) -> np.ndarray:
+        """
+        :return: (accounts, columns) float balances with decimals applied
+        """
+        if self._amounts is None:
+            wei = self.limbs.astype(np.float64) @ LIMB_SCALE
+            self._amounts = wei / 10.0**self.decimals
+        return self._amounts
+
+    def values_usd(self, prices: Dict[str, float]) -> np.ndarray:
+        """
+        :param prices: {symbol: usd price}, missing symbols count as 0
+        :return: usd value per account
+        """
+        price_vec = np.array([prices.get(s, 0.0) for s in self.symbols])
+        return self.amounts() @ price_vec
+
+    def totals_per_token(self) -> Dict[str, int]:
+        """
+        :return: {symbol: exact total in wei}
+        """
+        limb_sums = self.limbs.sum(axis=0, dtype=np.uint64)
+        return {
+            symbol: sum(int(v) << (LIMB_BITS * i) for i, v in enumerate(limb_sums[c]))
+            for c, symbol in enumerate(self.symbols)
+        }
+
+    def totals_per_user(self) -> Dict[str, Dict[str, float]]:
+        """
+        :return: {uid: {symbol: balance}}, unowned accounts are left out
+        """
+        owned = self.user_ids >= 0
+        ids = self.user_ids[owned]
+        amounts = self.amounts()[owned]
+        totals = np.stack(
+            [
+                np.bincount(ids, weights=amounts[:, c], minlength=len(self.users))
+                for c in range(len(self.symbols))
+            ],
+            axis=1,
+        )
+        return {
+            uid: dict(zip(self.symbols, totals[u].tolist()))
+            for u, uid in enumerate(self.users)
+        }
+
+    def top_n(self, n: int, prices: Dict[str, float]) -> List[tuple]:
+        """
+        :return: [(address, usd value)] of the n most valuable accounts
+        """
+        values = self.values_usd(prices)
+        n = min(n, len(values))
+        if n == 0:
+            return []
+        idx = np.argpartition(values, -n)[-n:]
+        idx = idx[np.argsort(values[idx])[::-1]]
+        return list(zip(self.addresses[idx].tolist(), values[idx].tolist()))
+
+    def above_threshold(self, min_usd: float, prices: Dict[str, float]) -> np.ndarray:
+        """
+        :return: addresses worth at least min_usd, e.g. MINIMUM_AMOUNT_USD
+        """
+        return self.addresses[self.values_usd(prices) >= min_usd]
@@ -0,0 +1,129 @@
+import time
+from collections import OrderedDict
+from threading import Condition, Thread
+from typing import Callable
+from metrics import metrics
+import config
+
+DEBUG = True
+
+# behaviour of put() on a full queue
+BLOCK = "block"
+DROP = "drop"
+
+
+class SweepQueue:
+    """
+    Accounts due for a sweep, consumed by a pool of sweep threads so a slow
+    sweep does not hold up the head loop. An account is queued at most once
+    and never swept by two workers at a time; one due again while being swept
+    is queued for another sweep afterwards.
+
+    When `maxsize` accounts are waiting, put() either blocks the head loop
+    until a worker frees a slot ("block", nothing is lost) or drops the
+    account ("drop", it is swept on its next deposit).
+    """
+
+    def __init__(
+        self,
+        sweep: Callable[[str], None],
+        workers=config.SWEEP_WORKERS,
+        maxsize=config.SWEEP_QUEUE_SIZE,
+        when_full=config.SWEEP_QUEUE_FULL,
+    ):
+        if when_full not in (BLOCK, DROP):
+            raise ValueError(f"unknown full queue behaviour: {when_full}")
+        self.sweep = sweep
+        self.workers = workers
+        self.maxsize = maxsize
+        self.when_full = when_full
+        self._cond = Condition()
+        # account -> time it was queued, oldest first
+        self.queue = OrderedDict()
+        self.in_flight = set()
+        self.busy = 0
+        self.stopped = False
+        self.threads = [
+            Thread(target=self._work, name=f"sweeper-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def put(self, account: str, debug=DEBUG) -> bool:
+        """
+        :param account: deposit address due for a sweep
+        :return: False if the account was dropped on a full queue
+        """
+        with self._cond:
+            if account in self.queue:
+                metrics.inc("sweep_queue.merged")
+                return True
+            while len(self.queue) >= self.maxsize:
+                if self.when_full == DROP:
+                    metrics.inc("sweep_queue.dropped")
+                    if debug:
+                        print(f"[SweepQueue] full, {account} dropped")
+                    return False
+                metrics.inc("sweep_queue.full")
+                self._cond.wait()
+            self.queue[account] = time.monotonic()
+            self._report()
+            self._cond.notify_all()
+            return True
+
+    def _take(self):
+        """
+        :return: (account, seconds it waited), the oldest account not being
+            swept, None once stopped
+        """
+        with self._cond:
+            while True:
+                if self.stopped:
+                    return None
+                for account, queued_at in self.queue.items():
+                    if account not in self.in_flight:
+                        del self.queue[account]
+                        self.in_flight.add(account)
+                        self.busy += 1
+                        self._report()
+                        self._cond.notify_all()
+                        return account, time.monotonic() - queued_at
+                self._cond.wait()
+
+    def _done(self, account: str):
+        with self._cond:
+            self.in_flight.discard(account)
+            self.busy -= 1
+            self._report()
+            self._cond.notify_all()
+
+    def _work(self):
+        while True:
+            taken = self._take()
+            if taken is None:
+                return
+            account, waited = taken
+            metrics.inc("sweep_queue.wait_seconds", waited)
+            metrics.set("sweep_queue.last_wait_seconds", waited)
+            try:
+                self.sweep(account)
+                metrics.inc("sweep_queue.swept")
+            except Exception as e:
+                metrics.inc("sweep_queue.failed")
+                print(f"[SweepQueue] sweep of {account} failed: {e}")
+            finally:
+                self._done(account)
+
+    def _report(self):
+        metrics.set("sweep_queue.length", len(self.queue))
+        metrics.set("sweep_queue.utilization", self.busy / self.workers)
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self.stopped = True
+            self._cond.notify_all()
+        for t in self.threads:
+            t.join(timeout)
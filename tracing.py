@@ -0,0 +1,179 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+import config
+
+DEBUG = True
+
+# span of the running code, per thread and per asyncio task
+_current = ContextVar("span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int = None
+    thread: int = field(default_factory=threading.get_ident)
+    attrs: dict = field(default_factory=dict)
+    sampled: bool = True
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+# children of a trace that is not sampled, records nothing
+_UNSAMPLED = Span("", "", "", None, 0, sampled=False)
+
+
+class Tracer:
+    """
+    Nested timing spans of the sweep lifecycle. Whether a trace is recorded
+    is decided once at its root span with probability `sample_rate`, so an
+    unsampled sweep only costs a random() call per root. Finished spans stay
+    in a bounded buffer for export_chrome() and, when `sink` is set, each
+    finished trace is appended to it as one OTLP/JSON line.
+    """
+
+    def __init__(
+        self,
+        sample_rate=config.TRACE_SAMPLE_RATE,
+        sink=config.TRACE_FILE,
+        max_spans=config.TRACE_MAX_SPANS,
+    ):
+        self.sample_rate = sample_rate
+        self.sink = sink
+        self._lock = Lock()
+        self.spans = deque(maxlen=max_spans)
+        # trace id -> finished spans of a trace whose root is still open
+        self._open = {}
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """
+        :param name: e.g. "sweeper.est_gas_price"
+        :param attrs: e.g. account=..., token=...
+        """
+        parent = _current.get()
+        if parent is None:
+            if random.random() >= self.sample_rate:
+                parent = _UNSAMPLED
+            else:
+                trace_id = os.urandom(16).hex()
+                with self._lock:
+                    self._open[trace_id] = []
+                parent = Span("", trace_id, None, None, 0)
+        if not parent.sampled:
+            token = _current.set(_UNSAMPLED)
+            try:
+                yield _UNSAMPLED
+            finally:
+                _current.reset(token)
+            return
+
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id,
+            start_ns=time.time_ns(),
+            attrs=attrs,
+        )
+        token = _current.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=str(e))
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current.reset(token)
+            self._finish(span)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+            trace = self._open.get(span.trace_id)
+            if trace is None:
+                return
+            trace.append(span)
+            if span.parent_id is not None:
+                return
+            del self._open[span.trace_id]
+        if self.sink is not None:
+            with open(self.sink, "a") as f:
+                f.write(json.dumps(otlp(trace), separators=(",", ":")) + "\n")
+
+    def export_chrome(self, path: str):
+        """
+        Write the buffered spans as Chrome trace JSON, for chrome://tracing
+        or Perfetto
+        """
+        with self._lock:
+            spans = list(self.spans)
+        events = [
+            {
+                "name": s.name,
+                "ph": "X",
+                "ts": s.start_ns / 1000,
+                "dur": (s.end_ns - s.start_ns) / 1000,
+                "pid": os.getpid(),
+                "tid": s.thread,
+                "args": {**s.attrs, "trace_id": s.trace_id},
+            }
+            for s in spans
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events}, f)
+
+
+def otlp(spans: list) -> dict:
+    """
+    :return: the spans as an OTLP/JSON ExportTraceServiceRequest, as written
+        by the OpenTelemetry collector's file exporter
+    """
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": "sweeper"}}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "sweeper"},
+                        "spans": [
+                            {
+                                "traceId": s.trace_id,
+                                "spanId": s.span_id,
+                                "parentSpanId": s.parent_id or "",
+                                "name": s.name,
+                                "kind": 1,
+                                "startTimeUnixNano": str(s.start_ns),
+                                "endTimeUnixNano": str(s.end_ns),
+                                "attributes": [
+                                    {"key": k, "value": {"stringValue": str(v)}}
+                                    for k, v in s.attrs.items()
+                                ],
+                            }
+                            for s in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+tracer = Tracer()
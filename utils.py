@@ -2,6 +2,7 @@ from web3 import Web3
 from web3.middleware import geth_poa_middleware
 from classes import Account
 import json
+from nonces import nonces
 import constants
 import ERC20
 
@@ -42,9 +43,7 @@ def create_erc20(
     token_contract = provider.eth.contract(abi=ERC20.abi, bytecode=ERC20.bytecode)
     construct_tx = token_contract.constructor(
         name=name, symbol=symbol, _decimals=decimals, supply=supply
-    ).build_transaction(
-        {"nonce": provider.eth.get_transaction_count(signer), "gas": 10_000_000}
-    )
+    ).build_transaction({"nonce": nonces.next(signer), "gas": 10_000_000})
 
     signed = provider.eth.account.sign_transaction(
         construct_tx,
@@ -61,6 +60,30 @@ def create_erc20(
         return None
 
 
+def create_batch_sweeper(
+    provider,
+    signer=constants.SIGNER,
+    signer_pkey=constants.SIGNER_PKEY,
+) -> str | None:
+    sweeper_contract = provider.eth.contract(
+        abi=ERC20.batch_sweeper_abi, bytecode=ERC20.batch_sweeper_bytecode
+    )
+    construct_tx = sweeper_contract.constructor().build_transaction(
+        {"nonce": nonces.next(signer), "gas": 2_000_000}
+    )
+
+    signed = provider.eth.account.sign_transaction(construct_tx, signer_pkey)
+
+    tx_hash = provider.eth.send_raw_transaction(signed.rawTransaction)
+    tx_receipt = provider.eth.wait_for_transaction_receipt(tx_hash)
+
+    if tx_receipt["contractAddress"]:
+        return tx_receipt["contractAddress"]
+    else:
+        print("Failed to deploy batch sweeper")
+        return None
+
+
 def contract_loader(provider, contract_address, abi):
     """
     :param provider: web3 provider object